@@ -0,0 +1,32 @@
+"""index reactions by interview and time
+
+Revision ID: 3f1c2a9d7e45
+Revises: 5b46c3a6f9b7
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+
+from alembic import op
+from sqlalchemy.inspection import inspect
+
+# revision identifiers, used by Alembic.
+revision = "3f1c2a9d7e45"
+down_revision = "5b46c3a6f9b7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = inspect(op.get_bind())
+    indexes = [index["name"] for index in inspector.get_indexes("good_or_bad")]
+
+    if "ix_good_or_bad_interview_datetime" not in indexes:
+        op.create_index(
+            "ix_good_or_bad_interview_datetime",
+            "good_or_bad",
+            ["interview", "datetime"],
+        )
+
+
+def downgrade():
+    op.drop_index("ix_good_or_bad_interview_datetime", table_name="good_or_bad")
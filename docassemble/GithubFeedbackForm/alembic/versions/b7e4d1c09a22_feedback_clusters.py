@@ -0,0 +1,50 @@
+"""feedback clusters
+
+Revision ID: b7e4d1c09a22
+Revises: 3f1c2a9d7e45
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.inspection import inspect
+
+# revision identifiers, used by Alembic.
+revision = "b7e4d1c09a22"
+down_revision = "3f1c2a9d7e45"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = inspect(op.get_bind())
+    columns = [col["name"] for col in inspector.get_columns("feedback_session")]
+    indexes = [index["name"] for index in inspector.get_indexes("feedback_session")]
+
+    if "cluster_id" not in columns:
+        op.add_column(
+            "feedback_session", sa.Column("cluster_id", sa.Integer(), nullable=True)
+        )
+    if "ix_feedback_session_cluster_id" not in indexes:
+        op.create_index(
+            "ix_feedback_session_cluster_id", "feedback_session", ["cluster_id"]
+        )
+    if not inspector.has_table("feedback_cluster"):
+        op.create_table(
+            "feedback_cluster",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("interview", sa.String(), index=True),
+            sa.Column("size", sa.Integer()),
+            sa.Column("label", sa.String()),
+            sa.Column("terms", sa.Text()),
+            sa.Column("centroid", sa.LargeBinary()),
+            sa.Column("representative_id", sa.Integer(), nullable=True),
+            sa.Column("datetime", sa.DateTime()),
+        )
+
+
+def downgrade():
+    op.drop_table("feedback_cluster")
+    op.drop_index("ix_feedback_session_cluster_id", table_name="feedback_session")
+    op.drop_column("feedback_session", "cluster_id")
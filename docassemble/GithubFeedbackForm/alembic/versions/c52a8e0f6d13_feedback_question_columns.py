@@ -0,0 +1,42 @@
+"""feedback question, variable and version columns
+
+Revision ID: c52a8e0f6d13
+Revises: b7e4d1c09a22
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.inspection import inspect
+
+# revision identifiers, used by Alembic.
+revision = "c52a8e0f6d13"
+down_revision = "b7e4d1c09a22"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = inspect(op.get_bind())
+    columns = [col["name"] for col in inspector.get_columns("feedback_session")]
+    indexes = [index["name"] for index in inspector.get_indexes("feedback_session")]
+
+    for column in ["question_id", "variable", "package_version"]:
+        if column not in columns:
+            op.add_column(
+                "feedback_session", sa.Column(column, sa.String(), nullable=True)
+            )
+    if "ix_feedback_session_question" not in indexes:
+        op.create_index(
+            "ix_feedback_session_question",
+            "feedback_session",
+            ["interview", "package_version", "question_id"],
+        )
+
+
+def downgrade():
+    op.drop_index("ix_feedback_session_question", table_name="feedback_session")
+    op.drop_column("feedback_session", "package_version")
+    op.drop_column("feedback_session", "variable")
+    op.drop_column("feedback_session", "question_id")
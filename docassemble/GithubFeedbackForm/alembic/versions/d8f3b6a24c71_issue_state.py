@@ -0,0 +1,42 @@
+"""github issue state
+
+Revision ID: d8f3b6a24c71
+Revises: c52a8e0f6d13
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.inspection import inspect
+
+# revision identifiers, used by Alembic.
+revision = "d8f3b6a24c71"
+down_revision = "c52a8e0f6d13"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = inspect(op.get_bind())
+    columns = [col["name"] for col in inspector.get_columns("feedback_session")]
+    indexes = [index["name"] for index in inspector.get_indexes("feedback_session")]
+
+    if "issue_state" not in columns:
+        op.add_column(
+            "feedback_session", sa.Column("issue_state", sa.String(), nullable=True)
+        )
+    if "closed_at" not in columns:
+        op.add_column(
+            "feedback_session", sa.Column("closed_at", sa.DateTime(), nullable=True)
+        )
+    if "ix_feedback_session_html_url" not in indexes:
+        op.create_index(
+            "ix_feedback_session_html_url", "feedback_session", ["html_url"]
+        )
+
+
+def downgrade():
+    op.drop_index("ix_feedback_session_html_url", table_name="feedback_session")
+    op.drop_column("feedback_session", "closed_at")
+    op.drop_column("feedback_session", "issue_state")
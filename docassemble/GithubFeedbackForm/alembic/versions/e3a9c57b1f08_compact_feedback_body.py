@@ -0,0 +1,52 @@
+"""store feedback as details and fields instead of a rendered body
+
+Revision ID: e3a9c57b1f08
+Revises: d8f3b6a24c71
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.inspection import inspect
+
+# revision identifiers, used by Alembic.
+revision = "e3a9c57b1f08"
+down_revision = "d8f3b6a24c71"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = inspect(op.get_bind())
+    columns = [col["name"] for col in inspector.get_columns("feedback_session")]
+
+    if "body_template" not in columns:
+        op.add_column(
+            "feedback_session", sa.Column("body_template", sa.String(), nullable=True)
+        )
+    if "details" not in columns:
+        op.add_column(
+            "feedback_session", sa.Column("details", sa.Text(), nullable=True)
+        )
+    if "details_compressed" not in columns:
+        op.add_column(
+            "feedback_session",
+            sa.Column("details_compressed", sa.LargeBinary(), nullable=True),
+        )
+    if "page_title" not in columns:
+        op.add_column(
+            "feedback_session", sa.Column("page_title", sa.String(), nullable=True)
+        )
+    if "maturity_level" not in columns:
+        op.add_column(
+            "feedback_session", sa.Column("maturity_level", sa.String(), nullable=True)
+        )
+
+
+def downgrade():
+    op.drop_column("feedback_session", "maturity_level")
+    op.drop_column("feedback_session", "page_title")
+    op.drop_column("feedback_session", "details_compressed")
+    op.drop_column("feedback_session", "details")
+    op.drop_column("feedback_session", "body_template")
@@ -0,0 +1,42 @@
+"""content hashes for idempotent imports
+
+Revision ID: f4b6c81d2e07
+Revises: e3a9c57b1f08
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.inspection import inspect
+
+# revision identifiers, used by Alembic.
+revision = "f4b6c81d2e07"
+down_revision = "e3a9c57b1f08"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = inspect(op.get_bind())
+    for table_name in ["feedback_session", "good_or_bad"]:
+        columns = [col["name"] for col in inspector.get_columns(table_name)]
+        indexes = [index["name"] for index in inspector.get_indexes(table_name)]
+
+        if "content_hash" not in columns:
+            op.add_column(
+                table_name, sa.Column("content_hash", sa.String(64), nullable=True)
+            )
+        if f"ux_{table_name}_content_hash" not in indexes:
+            op.create_index(
+                f"ux_{table_name}_content_hash",
+                table_name,
+                ["content_hash"],
+                unique=True,
+            )
+
+
+def downgrade():
+    for table_name in ["feedback_session", "good_or_bad"]:
+        op.drop_index(f"ux_{table_name}_content_hash", table_name=table_name)
+        op.drop_column(table_name, "content_hash")
@@ -0,0 +1,176 @@
+"""
+Groups open-ended feedback into themes without any network calls.
+
+Feedback text is turned into vectors with the "hashing trick" (each word is
+hashed to a column, so there is no vocabulary to store or refit), and the
+vectors are clustered incrementally: each new piece of feedback joins the
+closest existing theme if it is similar enough, or starts a new theme.
+Themes only need their centroid and size to take in new feedback, so the
+batch job only ever reads feedback that hasn't been clustered yet.
+"""
+
+import re
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+__all__ = [
+    "N_FEATURES",
+    "FeedbackTheme",
+    "tokenize",
+    "vectorize",
+    "assign_themes",
+]
+
+N_FEATURES = 2**12
+
+_TOKEN_REGEX = re.compile(r"[a-z][a-z']{2,}")
+
+_STOP_WORDS = frozenset(
+    """
+    about after again all also and any are because been before being but can
+    cannot could did does doing don't down each even every for from get got had
+    has have having her here him his how i'm into it's its just like make more
+    most much not now off once only other our out over please really same she
+    should some such than that the their them then there these they this those
+    through too under until very was way were what when where which while who
+    why will with would you you're your yours
+    """.split()
+    # Boilerplate from the feedback.yml issue template
+    + """
+    nbsp details question variable sought package version filename page title
+    maturity target level playground
+    """.split()
+)
+
+
+class FeedbackTheme:
+    """A cluster of similar feedback: its mean vector, size, and most common words."""
+
+    def __init__(
+        self,
+        theme_id: Optional[int],
+        centroid: np.ndarray,
+        size: int,
+        terms: Optional[Dict[str, int]] = None,
+        representative_id: Optional[int] = None,
+    ):
+        self.theme_id = theme_id
+        self.centroid = centroid
+        self.size = size
+        self.terms = Counter(terms or {})
+        self.representative_id = representative_id
+        self.changed = False
+
+    def add(self, vector: np.ndarray, tokens: List[str]) -> None:
+        self.centroid = (self.centroid * self.size + vector) / (self.size + 1)
+        self.size += 1
+        self.terms.update(tokens)
+        self.changed = True
+
+    def top_terms(self, count: int = 50) -> Dict[str, int]:
+        return dict(self.terms.most_common(count))
+
+    def label(self, count: int = 3) -> str:
+        return ", ".join(term for term, _ in self.terms.most_common(count))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercases `text` and splits it into words, dropping common and template words"""
+    if not text:
+        return []
+    return [
+        token
+        for token in _TOKEN_REGEX.findall(text.lower())
+        if token not in _STOP_WORDS
+    ]
+
+
+def _hash_token(token: str) -> Tuple[int, float]:
+    hashed = zlib.crc32(token.encode("utf-8"))
+    # Use the top bit as a sign so that hash collisions tend to cancel out
+    return hashed % N_FEATURES, (1.0 if hashed & 0x80000000 else -1.0)
+
+
+def vectorize(token_lists: Iterable[List[str]]) -> np.ndarray:
+    """Turns lists of tokens into L2 normalized rows of a (documents x N_FEATURES)
+    matrix, with sublinear (1 + log) term frequency weights"""
+    token_lists = list(token_lists)
+    matrix = np.zeros((len(token_lists), N_FEATURES), dtype=np.float32)
+    for row, tokens in enumerate(token_lists):
+        for token, count in Counter(tokens).items():
+            column, sign = _hash_token(token)
+            matrix[row, column] += sign * (1.0 + np.log(count))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _similarities(themes: List[FeedbackTheme], vectors: np.ndarray) -> np.ndarray:
+    """Cosine similarities of each vector (rows) to each theme (columns)"""
+    if not themes:
+        return np.zeros((len(vectors), 0), dtype=np.float32)
+    centroids = np.stack([theme.centroid for theme in themes])
+    centroid_norms = np.linalg.norm(centroids, axis=1)
+    centroid_norms[centroid_norms == 0] = 1.0
+    return (vectors @ centroids.T) / centroid_norms
+
+
+def assign_themes(
+    themes: List[FeedbackTheme],
+    feedback: List[Tuple[int, Optional[str]]],
+    threshold: float = 0.35,
+) -> List[Tuple[int, FeedbackTheme]]:
+    """Adds each piece of feedback to the most similar theme, starting new themes as needed.
+
+    Args:
+        themes: the existing themes for one interview. Updated in place, and new themes
+            (with a `theme_id` of None) are appended to it.
+        feedback: (id, text) pairs of feedback that isn't in a theme yet
+        threshold: the lowest cosine similarity to a theme's centroid needed to join it
+
+    Returns:
+        (feedback id, theme) pairs. Feedback with no words left after tokenizing
+        isn't assigned a theme.
+    """
+    tokenized = [(feedback_id, tokenize(text)) for feedback_id, text in feedback]
+    tokenized = [(feedback_id, tokens) for feedback_id, tokens in tokenized if tokens]
+    if not tokenized:
+        return []
+    vectors = vectorize(tokens for _, tokens in tokenized)
+
+    # Compare the whole batch to the existing themes at once; only the themes
+    # started during this batch need to be compared one piece of feedback at a time
+    existing_count = len(themes)
+    similarities = _similarities(themes, vectors)
+    assignments = []
+    for row, (feedback_id, tokens) in enumerate(tokenized):
+        vector = vectors[row]
+        best_similarity, best_theme = -1.0, None
+        if existing_count:
+            best_index = int(np.argmax(similarities[row]))
+            best_similarity = float(similarities[row, best_index])
+            best_theme = themes[best_index]
+        if len(themes) > existing_count:
+            new_themes = themes[existing_count:]
+            new_similarities = _similarities(new_themes, vector[None, :])[0]
+            new_index = int(np.argmax(new_similarities))
+            if new_similarities[new_index] > best_similarity:
+                best_similarity = float(new_similarities[new_index])
+                best_theme = new_themes[new_index]
+        if best_theme is not None and best_similarity >= threshold:
+            best_theme.add(vector, tokens)
+        else:
+            best_theme = FeedbackTheme(
+                None,
+                vector.copy(),
+                1,
+                Counter(tokens),
+                representative_id=feedback_id,
+            )
+            best_theme.changed = True
+            themes.append(best_theme)
+        assignments.append((feedback_id, best_theme))
+    return assignments
@@ -0,0 +1,383 @@
+# do not pre-load
+"""
+Bulk imports feedback and thumbs up / down reactions, e.g. when moving servers
+or rebuilding the database from an export.
+
+Rows are read from JSONL or CSV files (optionally gzipped) one at a time, and
+saved in large batches, each in its own transaction: with Postgres `COPY` when
+the database is Postgres (through psycopg2), and with multi-row inserts
+otherwise. Every imported row gets a hash of its contents, the file it came
+from and how many identical rows came before it in that file, and rows whose
+hash is already in the table are skipped, so an import that was interrupted can
+simply be run again. Identical rows in one file, like thumbs up reactions on
+the same day, are all imported.
+
+The columns are the same as the ones `get_all_feedback_info` returns (for
+feedback) or the `good_or_bad` table has (for reactions); unknown columns are
+ignored. For example:
+
+    python -m docassemble.GithubFeedbackForm.feedback_import feedback feedback.jsonl
+    python -m docassemble.GithubFeedbackForm.feedback_import reactions reactions.csv.gz
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from docassemble.base.util import log
+
+from . import feedback_on_server
+from .feedback_on_server import (
+    FEEDBACK_BODY_TEMPLATE,
+    _bump_data_version,
+    _compress_details,
+    feedback_session_table,
+    good_or_bad_table,
+    metadata_obj,
+)
+
+__all__ = ["ImportProgress", "read_records", "import_records", "import_file", "main"]
+
+FEEDBACK_COLUMNS = [
+    "interview",
+    "session_id",
+    "body",
+    "html_url",
+    "archived",
+    "datetime",
+    "github_user",
+    "github_repo_name",
+    "question_id",
+    "variable",
+    "package_version",
+    "issue_state",
+    "closed_at",
+    "body_template",
+    "details",
+    "page_title",
+    "maturity_level",
+]
+REACTION_COLUMNS = ["reaction", "interview", "version", "datetime"]
+_DATETIME_COLUMNS = ["datetime", "closed_at"]
+
+_TABLES = {"feedback": feedback_session_table, "reactions": good_or_bad_table}
+
+
+class ImportProgress:
+    """Counts of what an import has done so far"""
+
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.started = time.monotonic()
+
+    @property
+    def seconds(self) -> float:
+        return time.monotonic() - self.started
+
+    def __str__(self) -> str:
+        rate = self.read / self.seconds if self.seconds else 0.0
+        return (
+            f"{self.read} read, {self.inserted} inserted, {self.skipped} already "
+            f"imported, {self.invalid} invalid ({rate:.0f} rows/s)"
+        )
+
+
+def _open(path: str) -> TextIO:
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Streams the rows of a JSONL or CSV file (by its extension, before any .gz).
+    `-` reads JSONL from standard input."""
+    name = path[: -len(".gz")] if path.endswith(".gz") else path
+    with _open(path) as source:
+        if name.endswith(".csv"):
+            for record in csv.DictReader(source):
+                # CSV has no nulls; treat empty cells as missing
+                yield {key: value for key, value in record.items() if value != ""}
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if value is not None and not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if value is not None and value.tzinfo is not None:
+        # Like the rest of the table: in the server's local time, without a timezone
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "t", "yes", "y")
+    return bool(value)
+
+
+def _content_hash(
+    kind: str,
+    values: Dict[str, Any],
+    source_id: Any,
+    source: Optional[str] = None,
+    occurrence: int = 0,
+) -> str:
+    """Identifies a row by everything that was imported for it, including the id it
+    had in the export if there was one, the file it came from, and how many
+    identical rows came before it"""
+    content = json.dumps(
+        [kind, source, source_id, values, occurrence],
+        sort_keys=True,
+        default=str,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _feedback_values(record: Dict[str, Any]) -> Dict[str, Any]:
+    values = {column: record.get(column) for column in FEEDBACK_COLUMNS}
+    if not values["interview"] or not (
+        values["body"] or values["details"] or values["session_id"]
+    ):
+        raise ValueError("feedback needs an interview and a body, details or session")
+    for column in _DATETIME_COLUMNS:
+        values[column] = _parse_datetime(values[column])
+    values["archived"] = _parse_bool(values["archived"] or False)
+    # An explicit null is kept: it is how text-only feedback (like reviews) is saved
+    if (
+        "body_template" not in record
+        and values["details"] is not None
+        and not values["body"]
+    ):
+        values["body_template"] = FEEDBACK_BODY_TEMPLATE
+    return values
+
+
+def _reaction_values(record: Dict[str, Any]) -> Dict[str, Any]:
+    values = {column: record.get(column) for column in REACTION_COLUMNS}
+    if values["reaction"] is None:
+        raise ValueError("reactions need a reaction")
+    values["reaction"] = int(values["reaction"])
+    values["datetime"] = _parse_datetime(values["datetime"])
+    return values
+
+
+def _insert_batch(conn, table, rows: List[Dict[str, Any]]) -> int:
+    """Multi-row inserts that skip rows whose content hash is already in the table.
+    Returns how many rows were inserted."""
+    dialect = conn.engine.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        # SQLAlchemy sends executemany with RETURNING as multi-row VALUES statements
+        stmt = (
+            dialect_insert(table)
+            .on_conflict_do_nothing(index_elements=["content_hash"])
+            .returning(table.c.content_hash)
+        )
+        return len(conn.execute(stmt, rows).all())
+    existing = set(
+        conn.execute(
+            select(table.c.content_hash).where(
+                table.c.content_hash.in_([row["content_hash"] for row in rows])
+            )
+        ).scalars()
+    )
+    new_rows = [row for row in rows if row["content_hash"] not in existing]
+    if new_rows:
+        conn.execute(insert(table), new_rows)
+    return len(new_rows)
+
+
+def _copy_value(value: Any) -> str:
+    """One CSV field for COPY: NULL as an unquoted \\N, and everything else quoted, so
+    that empty strings (and the text \\N) aren't read as NULL"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bytes):
+        value = "\\x" + value.hex()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_batch(conn, table, rows: List[Dict[str, Any]]) -> int:
+    """Postgres COPY into a temporary table, then one INSERT ... SELECT that skips
+    rows whose content hash is already in the table"""
+    columns = list(rows[0])
+    column_list = ", ".join(columns)
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_copy_value(row[column]) for column in columns) + "\n")
+    buffer.seek(0)
+
+    staging = f"import_{table.name}"
+    conn.execute(
+        text(
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {column_list} FROM {table.name} WITH NO DATA"
+        )
+    )
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+    finally:
+        cursor.close()
+    return conn.execute(
+        text(
+            f"INSERT INTO {table.name} ({column_list}) SELECT {column_list} "
+            f"FROM {staging} ON CONFLICT (content_hash) DO NOTHING"
+        )
+    ).rowcount
+
+
+def import_records(
+    kind: str,
+    records: Iterable[Dict[str, Any]],
+    *,
+    engine=None,
+    batch_size: int = 5000,
+    use_copy: Optional[bool] = None,
+    progress: Optional[Callable[[ImportProgress], None]] = None,
+    source: Optional[str] = None,
+) -> ImportProgress:
+    """
+    Saves feedback or reactions in bulk, skipping rows that were imported before.
+
+    Args:
+        kind: "feedback" or "reactions"
+        records: dicts of column names to values, e.g. from `read_records`
+        engine: the SQLAlchemy engine to import into. Defaults to the docassemble database.
+        batch_size: how many rows to save in each transaction
+        use_copy: use Postgres COPY. Defaults to True when the database is Postgres
+            and the driver is psycopg2.
+        progress: called with the running totals after each batch
+        source: the name of the file the records came from, so that identical rows
+            in different files are all imported
+
+    Returns:
+        the totals once every record has been read
+    """
+    table = _TABLES[kind]
+    to_values = _feedback_values if kind == "feedback" else _reaction_values
+    engine = engine or feedback_on_server.engine
+    if use_copy is None:
+        use_copy = (
+            engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+        )
+    save_batch = _copy_batch if use_copy else _insert_batch
+
+    totals = ImportProgress()
+    batch: List[Dict[str, Any]] = []
+    occurrences: Counter = Counter()
+
+    def flush() -> None:
+        if not batch:
+            return
+        rows = list(batch)
+        if kind == "feedback":
+            rows = [
+                {"details_compressed": None, **_compress_details(row)} for row in rows
+            ]
+        with engine.begin() as conn:
+            inserted = save_batch(conn, table, rows)
+        totals.inserted += inserted
+        totals.skipped += len(rows) - inserted
+        batch.clear()
+        if progress:
+            progress(totals)
+
+    for record in records:
+        totals.read += 1
+        try:
+            values = to_values(record)
+        except (ValueError, TypeError) as ex:
+            totals.invalid += 1
+            if totals.invalid <= 10:
+                log(f"feedback_import: skipping row {totals.read}: {ex}")
+            continue
+        content_hash = _content_hash(kind, values, record.get("id"), source)
+        occurrence = occurrences[content_hash]
+        occurrences[content_hash] += 1
+        if occurrence:
+            content_hash = _content_hash(
+                kind, values, record.get("id"), source, occurrence
+            )
+        values["content_hash"] = content_hash
+        # After hashing, so that rows without a time are still only imported once
+        values["datetime"] = values["datetime"] or datetime.now()
+        batch.append(values)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if totals.inserted:
+        _bump_data_version("feedback" if kind == "feedback" else "reactions")
+    return totals
+
+
+def import_file(kind: str, path: str, **kwargs) -> ImportProgress:
+    """`import_records` for the rows of a JSONL or CSV file; see `read_records`"""
+    kwargs.setdefault("source", os.path.basename(path))
+    return import_records(kind, read_records(path), **kwargs)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Bulk imports feedback or reactions from JSONL or CSV files"
+    )
+    parser.add_argument("kind", choices=sorted(_TABLES))
+    parser.add_argument("paths", nargs="+", help="JSONL or CSV files, or - for stdin")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--db-url", help="defaults to the configured docassemble database"
+    )
+    parser.add_argument(
+        "--no-copy",
+        action="store_true",
+        help="use multi-row inserts even on Postgres",
+    )
+    args = parser.parse_args(argv)
+
+    engine = None
+    if args.db_url:
+        engine = create_engine(args.db_url)
+        metadata_obj.create_all(engine)
+
+    def report(totals: ImportProgress) -> None:
+        print(totals, file=sys.stderr)
+
+    for path in args.paths:
+        print(f"Importing {args.kind} from {path}", file=sys.stderr)
+        totals = import_file(
+            args.kind,
+            path,
+            engine=engine,
+            batch_size=args.batch_size,
+            use_copy=False if args.no_copy else None,
+            progress=report,
+        )
+        print(f"Done with {path} in {totals.seconds:.1f}s: {totals}")
+
+
+if __name__ == "__main__":
+    main()
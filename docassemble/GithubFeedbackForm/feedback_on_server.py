@@ -1,22 +1,31 @@
 import os
 import importlib
 import json
+import math
+import zlib
+import numpy as np
 
-from typing import Optional, Iterable, List, Tuple
-from datetime import datetime
+from typing import Any, Dict, Optional, Iterable, List, Tuple
+from datetime import datetime, timedelta
 from sqlalchemy import (
     asc,
+    case,
+    cast,
     desc,
     insert,
     update,
     select,
+    bindparam,
     Text,
     DateTime,
     Table,
     Column,
     String,
     Integer,
+    Index,
+    LargeBinary,
     Boolean,
+    Float,
     MetaData,
     create_engine,
     func,
@@ -24,12 +33,28 @@ from sqlalchemy import (
 from sqlalchemy.orm import declarative_base
 from alembic.config import Config
 from alembic import command
-from docassemble.base.util import DARedis, log
+from docassemble.base.util import DARedis, get_config, log, send_email
 from docassemble.base.sql import alchemy_url, connect_args
+from .github_issue import (
+    _get_allowed_repo_owners,
+    get_feedback_repository,
+    make_github_issues,
+)
+from .feedback_clusters import FeedbackTheme, assign_themes
+from .feedback_storage import (
+    FeedbackStorage,
+    JSONLFeedbackStorage,
+    RedisStreamFeedbackStorage,
+)
 
 __all__ = [
     "save_feedback_info",
+    "render_feedback_body",
+    "feedback_body",
+    "feedback_text",
     "set_feedback_github_url",
+    "set_feedback_github_urls",
+    "create_github_issues_for_feedback",
     "redis_panel_emails_key",
     "add_panel_participant",
     "potential_panelists",
@@ -37,9 +62,43 @@ __all__ = [
     "get_all_feedback_info",
     "save_good_or_bad",
     "get_good_or_bad",
+    "get_good_or_bad_trend",
+    "compare_good_or_bad_versions",
+    "get_db_pool_status",
+    "cluster_feedback",
+    "get_feedback_clusters",
+    "get_feedback_hotspots",
+    "get_dashboard_data",
+    "queue_failed_issue",
+    "failed_issue_count",
+    "send_failed_issue_digest",
+    "replay_failed_issues",
+    "update_issue_states",
 ]
 
 redis_panel_emails_key = "docassemble-GithubFeedbackForm:panel_emails"
+redis_reaction_dedup_prefix = "docassemble-GithubFeedbackForm:reacted"
+redis_data_version_prefix = "docassemble-GithubFeedbackForm:data_version"
+redis_dashboard_cache_prefix = "docassemble-GithubFeedbackForm:dashboard"
+redis_failed_issues_key = "docassemble-GithubFeedbackForm:failed_issues"
+redis_failed_issue_digest_prefix = "docassemble-GithubFeedbackForm:failed_issue_digest"
+
+# The most failed issues kept waiting to be sent to GitHub again
+MAX_FAILED_ISSUES = 10000
+# How many times an issue is sent to GitHub again before it is dropped
+MAX_REPLAY_ATTEMPTS = 10
+# The most issues held for each repository's digest email, and the most
+# repositories with a digest waiting, since repository names can come from URLs
+MAX_DIGEST_ITEMS = 100
+MAX_DIGEST_REPOS = 50
+
+# Upper bound on how long a cached dashboard query is kept, for queries whose
+# results also depend on the current time (like the last 30 days of trends)
+DASHBOARD_CACHE_SECONDS = 60 * 60
+
+# How long (in seconds) a session's reaction to an interview version is remembered
+# for de-duplication. Can be overridden with `github issues: reaction dedup seconds`
+DEFAULT_REACTION_DEDUP_SECONDS = 60 * 60 * 24 * 30
 
 ############################################
 ## Panel particitpants are managed through a Redis ZSet (a sorted/scored set).
@@ -64,6 +123,40 @@ def potential_panelists() -> Iterable[Tuple[str, datetime]]:
     ]
 
 
+############################################
+## Reactions are de-duplicated per (session, interview, version) with a
+## Redis key that expires (SET NX EX), so a repeated thumbs up / down is dropped
+## before it reaches the database.
+
+
+def _reaction_dedup_seconds() -> int:
+    github_config = get_config("github issues") or {}
+    return int(
+        github_config.get("reaction dedup seconds", DEFAULT_REACTION_DEDUP_SECONDS)
+    )
+
+
+def _is_first_reaction(
+    session_id: Optional[str], interview: Optional[str], version: Optional[str]
+) -> bool:
+    """Atomically records that this session reacted to this interview version.
+
+    Returns False if the session already reacted within the dedup window. If Redis
+    is unavailable, fails open and returns True so the reaction is still saved.
+    """
+    if not session_id:
+        return True
+    ttl = _reaction_dedup_seconds()
+    if ttl <= 0:
+        return True
+    key = f"{redis_reaction_dedup_prefix}:{interview}:{version}:{session_id}"
+    try:
+        return bool(DARedis().set(key, 1, nx=True, ex=ttl))
+    except Exception as ex:
+        log(f"feedback_on_server: unable to check for duplicate reaction: {ex}")
+        return True
+
+
 ###################################
 ## Using SQLAlchemy to save / retrieve session information that is linked
 ## to specific feedback issues, or just to store private feedback
@@ -111,6 +204,43 @@ feedback_session_table = Table(
     Column("datetime", DateTime),
     Column("github_user", String, nullable=True),
     Column("github_repo_name", String, nullable=True),
+    Column("cluster_id", Integer, nullable=True, index=True),
+    Column("question_id", String, nullable=True),
+    Column("variable", String, nullable=True),
+    Column("package_version", String, nullable=True),
+    Column("issue_state", String, nullable=True),
+    Column("closed_at", DateTime, nullable=True),
+    # New feedback is stored as the user's text plus the fields above, instead of
+    # a rendered `body`; see `feedback_body`
+    Column("body_template", String, nullable=True),
+    Column("details", Text, nullable=True),
+    Column("details_compressed", LargeBinary, nullable=True),
+    Column("page_title", String, nullable=True),
+    Column("maturity_level", String, nullable=True),
+    # Only set on imported rows, so importing the same file twice is a no-op; see feedback_import.py
+    Column("content_hash", String(64), nullable=True),
+    Index("ix_feedback_session_html_url", "html_url"),
+    Index("ux_feedback_session_content_hash", "content_hash", unique=True),
+    Index(
+        "ix_feedback_session_question",
+        "interview",
+        "package_version",
+        "question_id",
+    ),
+)
+
+## Themes found by grouping similar feedback, see `cluster_feedback`
+feedback_cluster_table = Table(
+    "feedback_cluster",
+    metadata_obj,
+    Column("id", Integer, primary_key=True),
+    Column("interview", String, index=True),
+    Column("size", Integer),
+    Column("label", String),
+    Column("terms", Text),
+    Column("centroid", LargeBinary),
+    Column("representative_id", Integer, nullable=True),
+    Column("datetime", DateTime),
 )
 
 good_or_bad_table = Table(
@@ -120,12 +250,53 @@ good_or_bad_table = Table(
     Column("interview", String),
     Column("version", String),
     Column("datetime", DateTime),
+    Column("content_hash", String(64), nullable=True),
+    Index("ix_good_or_bad_interview_datetime", "interview", "datetime"),
+    Index("ux_good_or_bad_content_hash", "content_hash", unique=True),
 )
 
 
+def _engine_options() -> Dict[str, Any]:
+    """Connection pool settings, from `github issues: database pool` in the config.
+
+    Every uWSGI / Celery process gets its own pool, so the total number of
+    Postgres connections can be as high as processes * (size + max overflow).
+    """
+    pool_config = (get_config("github issues") or {}).get("database pool") or {}
+    return {
+        "pool_size": int(pool_config.get("size", 5)),
+        "max_overflow": int(pool_config.get("max overflow", 10)),
+        "pool_timeout": int(pool_config.get("timeout", 30)),
+        "pool_recycle": int(pool_config.get("recycle", 1800)),
+        "pool_pre_ping": bool(pool_config.get("pre ping", True)),
+    }
+
+
 db_url = alchemy_url("db")
 conn_args = connect_args("db")
-engine = create_engine(db_url, connect_args=conn_args)
+engine = create_engine(db_url, connect_args=conn_args, **_engine_options())
+
+
+def _dispose_engine_after_fork() -> None:
+    # Connections inherited from the parent process can't be shared safely;
+    # drop them from this process's pool without closing the parent's sockets
+    engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_engine_after_fork)
+
+
+def get_db_pool_status() -> Dict[str, Any]:
+    """Returns how many database connections this process is using, to help tune
+    `github issues: database pool`"""
+    pool = engine.pool
+    status: Dict[str, Any] = {"pid": os.getpid(), "status": pool.status()}
+    for stat in ["size", "checkedin", "checkedout", "overflow"]:
+        if hasattr(pool, stat):
+            status[stat] = getattr(pool, stat)()
+    return status
+
 
 metadata_obj.create_all(engine)
 metadata_obj.bind = engine
@@ -139,82 +310,482 @@ upgrade_db(
 )
 
 
+###################################
+## Feedback bodies. Every issue body has the same Markdown table around the
+## user's text, so only the text and the fields that fill in the table are
+## saved, and the table is rendered when the body is displayed or sent to
+## GitHub. Long text is compressed in the SQL backend.
+
+# `body_template` of feedback rendered with `render_feedback_body`. Rows without
+# a `body_template` have their whole body in `details` (or, if saved before
+# bodies were split up, in `body`)
+FEEDBACK_BODY_TEMPLATE = "issue"
+
+# Text at least this long (in bytes) is saved zlib compressed
+COMPRESS_DETAILS_BYTES = 512
+
+
+def render_feedback_body(
+    details: Optional[str],
+    *,
+    question_id: Optional[str] = None,
+    page_title: Optional[str] = None,
+    variable: Optional[str] = None,
+    package_version: Optional[str] = None,
+    maturity_level: Optional[str] = None,
+    filename: Optional[str] = None,
+) -> str:
+    """The Markdown body of a feedback issue, as used by the `generic_report`
+    template in feedback.yml"""
+    lines = ["&nbsp; | &nbsp;", "-------|------------------------------------"]
+    if question_id:
+        lines.append(f"Question ID | `{question_id}`")
+    elif page_title:
+        lines.append(f"Page title | {page_title}")
+    lines.append(f"Details | {details or ''}")
+    if variable:
+        lines.append(f"Variable being sought | `{variable}`")
+    if package_version:
+        lines.append(f"Package version | `{package_version}`")
+    if maturity_level:
+        lines.append(f"Maturity target | {maturity_level}")
+    if filename:
+        lines.append(f"Filename | `{filename}`")
+    return "\n".join(lines) + "\n"
+
+
+def feedback_body(row: Dict[str, Any]) -> str:
+    """The full body of a saved piece of feedback, like from `get_all_feedback_info`"""
+    if row.get("body"):
+        return row["body"]
+    if row.get("body_template") == FEEDBACK_BODY_TEMPLATE:
+        return render_feedback_body(
+            row.get("details"),
+            question_id=row.get("question_id"),
+            page_title=row.get("page_title"),
+            variable=row.get("variable"),
+            package_version=row.get("package_version"),
+            maturity_level=row.get("maturity_level"),
+            filename=row.get("interview"),
+        )
+    return row.get("details") or ""
+
+
+def feedback_text(row: Dict[str, Any]) -> str:
+    """Just what the user wrote in a saved piece of feedback, without the
+    metadata table. Feedback saved before bodies were split up only has its full body.
+    """
+    return row.get("details") or row.get("body") or ""
+
+
+def _compress_details(values: Dict[str, Any]) -> Dict[str, Any]:
+    details = values.get("details")
+    if details:
+        encoded = details.encode("utf-8")
+        if len(encoded) >= COMPRESS_DETAILS_BYTES:
+            return {
+                **values,
+                "details": None,
+                "details_compressed": zlib.compress(encoded),
+            }
+    return values
+
+
+def _decompress_details(row: Dict[str, Any]) -> Dict[str, Any]:
+    compressed = row.pop("details_compressed", None)
+    if compressed is not None:
+        row["details"] = zlib.decompress(compressed).decode("utf-8")
+    return row
+
+
+def _is_row_id(feedback_id: Any) -> bool:
+    """If `feedback_id` can be the integer primary key of a `feedback_session` row"""
+    return isinstance(feedback_id, int) or str(feedback_id).strip().isdigit()
+
+
+class SQLFeedbackStorage(FeedbackStorage):
+    """Saves feedback and reactions in the docassemble SQL database. The default."""
+
+    def save_feedback(self, values: Dict[str, Any]) -> Optional[str]:
+        values = _compress_details(values)
+        with engine.begin() as conn:
+            result = conn.execute(insert(feedback_session_table).values(**values))
+            return (
+                result.inserted_primary_key[0] if result.inserted_primary_key else None
+            )
+
+    def update_feedback(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        # One executemany per set of columns being changed
+        by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for feedback_id, values in updates.items():
+            # Ids from other storage backends can't match a row here
+            if not _is_row_id(feedback_id):
+                continue
+            by_columns.setdefault(tuple(sorted(values)), []).append(
+                {"feedback_id": int(feedback_id), **values}
+            )
+        rowcount = 0
+        with engine.begin() as conn:
+            for columns, params in by_columns.items():
+                stmt = (
+                    update(feedback_session_table)
+                    .where(feedback_session_table.c.id == bindparam("feedback_id"))
+                    .values({column: bindparam(column) for column in columns})
+                )
+                rowcount += conn.execute(stmt, params).rowcount
+        return rowcount
+
+    def update_feedback_by_issue(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for html_url, values in updates.items():
+            by_columns.setdefault(tuple(sorted(values)), []).append(
+                {"issue_url": html_url, **values}
+            )
+        rowcount = 0
+        with engine.begin() as conn:
+            for columns, params in by_columns.items():
+                stmt = (
+                    update(feedback_session_table)
+                    .where(feedback_session_table.c.html_url == bindparam("issue_url"))
+                    .values({column: bindparam(column) for column in columns})
+                )
+                rowcount += conn.execute(stmt, params).rowcount
+        return rowcount
+
+    def _select_feedback(self, stmt) -> Dict[str, Dict[str, Any]]:
+        # Read-only, so no need to open (and commit) a transaction
+        with engine.connect() as conn:
+            results = conn.execute(stmt)
+            # Turn into literal dict because DA is too eager to save / load SQLAlchemy objects into the interview SQL
+            return {
+                str(row["id"]): _decompress_details(dict(row))
+                for row in results.mappings()
+            }
+
+    def get_all_feedback_info(
+        self, interview: Optional[str] = None, include_archived=False
+    ) -> Dict[str, Dict[str, Any]]:
+        stmt = select(feedback_session_table)
+        if interview:
+            stmt = stmt.where(feedback_session_table.c.interview == interview)
+        if not include_archived:
+            stmt = stmt.where(feedback_session_table.c.archived == False)
+        return self._select_feedback(stmt)
+
+    def get_feedback(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        return self._select_feedback(
+            select(feedback_session_table).where(
+                feedback_session_table.c.id.in_(
+                    [int(row_id) for row_id in ids if _is_row_id(row_id)]
+                )
+            )
+        )
+
+    def save_good_or_bad(
+        self, reaction: int, interview: Optional[str], version: Optional[str]
+    ) -> None:
+        stmt = insert(good_or_bad_table).values(
+            reaction=reaction,
+            interview=interview,
+            version=version,
+            datetime=datetime.now(),
+        )
+        with engine.begin() as conn:
+            conn.execute(stmt)
+
+    def get_good_or_bad(self, interview: Optional[str] = None) -> List[Dict[str, Any]]:
+        stmt = select(
+            good_or_bad_table.c.interview,
+            good_or_bad_table.c.version,
+            func.count().label("count"),
+            func.avg(good_or_bad_table.c.reaction).label("average"),
+        )
+        if interview:
+            stmt = stmt.where(good_or_bad_table.c.interview == interview)
+        stmt = stmt.group_by(good_or_bad_table.c.interview, good_or_bad_table.c.version)
+        stmt = stmt.order_by(
+            asc(good_or_bad_table.c.interview), desc(good_or_bad_table.c.version)
+        )
+        with engine.connect() as conn:
+            results = conn.execute(stmt)
+            return [dict(row) for row in results.mappings()]
+
+
+_storage_backends: Dict[str, FeedbackStorage] = {}
+
+
+def _get_storage(backend_name: str) -> FeedbackStorage:
+    if backend_name not in _storage_backends:
+        github_config = get_config("github issues") or {}
+        if backend_name == "redis":
+            _storage_backends[backend_name] = RedisStreamFeedbackStorage()
+        elif backend_name == "file" and github_config.get("storage path"):
+            _storage_backends[backend_name] = JSONLFeedbackStorage(
+                github_config.get("storage path"),
+                compact_every=int(github_config.get("storage compact every", 1000)),
+            )
+        else:
+            if backend_name != "sql":
+                log(
+                    f"feedback_on_server: can't use the '{backend_name}' storage backend, "
+                    "using 'sql' instead. Check `storage backend` and `storage path` in the `github issues` config"
+                )
+            _storage_backends[backend_name] = SQLFeedbackStorage()
+    return _storage_backends[backend_name]
+
+
+def _feedback_storage() -> FeedbackStorage:
+    """The storage for feedback, from `github issues: storage backend`: sql (the default), redis, or file"""
+    github_config = get_config("github issues") or {}
+    return _get_storage(github_config.get("storage backend", "sql"))
+
+
+def _reaction_storage() -> FeedbackStorage:
+    """The storage for reactions, from `github issues: reaction storage backend`,
+    which defaults to the same backend as the feedback"""
+    github_config = get_config("github issues") or {}
+    return _get_storage(
+        github_config.get(
+            "reaction storage backend", github_config.get("storage backend", "sql")
+        )
+    )
+
+
 def save_feedback_info(
     interview: str,
     *,
     session_id: Optional[str] = None,
     template=None,
     body=None,
+    details: Optional[str] = None,
     github_user: Optional[str] = None,
     github_repo_name: Optional[str] = None,
+    question_id: Optional[str] = None,
+    variable: Optional[str] = None,
+    package_version: Optional[str] = None,
+    page_title: Optional[str] = None,
+    maturity_level: Optional[str] = None,
 ) -> Optional[str]:
-    """Saves feedback along with optional session information in a SQL DB"""
+    """Saves feedback along with optional session information in a SQL DB
+
+    The question ID, variable and package version the feedback is about are
+    stored in their own columns so they can be counted with `get_feedback_hotspots`.
+
+    Pass what the user wrote as `details` to save it without the metadata table
+    from feedback.yml, which `feedback_body` renders again when it's needed.
+    A whole `body` (or the content of a `template`) is saved as it is.
+    """
     if template:
         body = template.content
+    body_template = FEEDBACK_BODY_TEMPLATE if details is not None else None
+    text = details if details is not None else body
 
-    if interview and (session_id or body):
-        stmt = insert(feedback_session_table).values(
-            interview=interview,
-            session_id=session_id,
-            body=body,
-            datetime=datetime.now(),
-            archived=False,
-            github_user=github_user,
-            github_repo_name=github_repo_name,
+    if interview and (session_id or text):
+        id_for_feedback = _feedback_storage().save_feedback(
+            {
+                "interview": interview,
+                "session_id": session_id,
+                "body_template": body_template,
+                "details": text,
+                "datetime": datetime.now(),
+                "archived": False,
+                "github_user": github_user,
+                "github_repo_name": github_repo_name,
+                "question_id": question_id,
+                "variable": variable,
+                "package_version": package_version,
+                "page_title": page_title or None,
+                "maturity_level": maturity_level or None,
+            }
         )
-        with engine.begin() as conn:
-            result = conn.execute(stmt)
-            id_for_feedback = (
-                result.inserted_primary_key[0] if result.inserted_primary_key else None
-            )
+        _bump_data_version("feedback")
 
         return id_for_feedback
     else:  # can happen if the forwarding interview didn't pass session info
         log(
-            f"feedback_on_server: Unable to save this feedback in DB: interview: {interview}, session_id: {session_id}, body: {body}"
+            f"feedback_on_server: Unable to save this feedback in DB: interview: {interview}, session_id: {session_id}, body: {text}"
         )
         return None
 
 
 def set_feedback_github_url(id_for_feedback: str, github_url: str) -> bool:
     """Returns true if save was successful"""
-    stmt = (
-        update(feedback_session_table)
-        .where(feedback_session_table.c.id == id_for_feedback)
-        .values(html_url=github_url)
-    )
-    with engine.begin() as conn:
-        result = conn.execute(stmt)
-    if result.rowcount == 0:
+    if not _feedback_storage().update_feedback(
+        {str(id_for_feedback): {"html_url": github_url}}
+    ):
         log(f"Cannot find {id_for_feedback} in DB")
         return False
+    _bump_data_version("feedback")
     return True
 
 
-def mark_archived(id_for_feedback: str) -> bool:
-    stmt = (
-        update(feedback_session_table)
-        .where(feedback_session_table.c.id == id_for_feedback)
-        .values(archived=True)
+def set_feedback_github_urls(github_urls: Dict[str, str]) -> int:
+    """Links many feedback rows to their GitHub issues in a single bulk update.
+
+    Args:
+        github_urls: a dict of feedback ids to the URL of the issue made for each
+
+    Returns:
+        the number of rows that were updated
+    """
+    if not github_urls:
+        return 0
+    rowcount = _feedback_storage().update_feedback(
+        {
+            str(feedback_id): {"html_url": github_url}
+            for feedback_id, github_url in github_urls.items()
+        }
     )
-    with engine.begin() as conn:
-        result = conn.execute(stmt)
-    if result.rowcount == 0:
+    _bump_data_version("feedback")
+    return rowcount
+
+
+def create_github_issues_for_feedback(
+    feedback_ids: Iterable[str],
+    label: Optional[str] = None,
+    title: str = "User feedback",
+    max_concurrency: int = 4,
+) -> Dict[str, Optional[str]]:
+    """Makes GitHub issues for several saved feedback rows at once and links
+    each row to its new issue.
+
+    Rows that are already linked to an issue are skipped. Rows without a saved
+    repository go to the repository routed to for their interview, or one named
+    after its package (see `get_feedback_repository`), with the route's label
+    instead of `label` if it has one.
+
+    Returns:
+        a dict of the feedback ids that were tried to the new issue's URL,
+        or None if it could not be created
+    """
+    ids = [str(feedback_id) for feedback_id in feedback_ids]
+    if not ids:
+        return {}
+    rows = [
+        row
+        for row in _feedback_storage().get_feedback(ids).values()
+        if not row.get("html_url")
+    ]
+
+    results: Dict[str, Optional[str]] = {}
+    # One batch per label, since make_github_issues gives every issue the same label
+    by_label: Dict[Optional[str], List[Tuple[str, Dict[str, Any]]]] = {}
+    for row in rows:
+        repository = get_feedback_repository(
+            row.get("interview"), row.get("github_user"), row.get("github_repo_name")
+        )
+        if not repository:
+            log(
+                f"create_github_issues_for_feedback: no repository for feedback "
+                f"{row['id']}, since it isn't on an interview"
+            )
+            results[str(row["id"])] = None
+            continue
+        by_label.setdefault(repository.label or label, []).append(
+            (
+                str(row["id"]),
+                {
+                    "repo_owner": repository.owner,
+                    "repo_name": repository.repo,
+                    "title": title,
+                    "body": feedback_body(row),
+                },
+            )
+        )
+    for issue_label, batch in by_label.items():
+        urls = make_github_issues(
+            [issue for _, issue in batch],
+            label=issue_label,
+            max_concurrency=max_concurrency,
+        )
+        results.update({row_id: url for (row_id, _), url in zip(batch, urls)})
+    set_feedback_github_urls({row_id: url for row_id, url in results.items() if url})
+    return results
+
+
+def update_issue_states(issues: Iterable[Dict[str, Any]]) -> int:
+    """Saves the state of the GitHub issues linked to feedback, e.g. from the
+    `issues` webhook events handled in `github_webhook.py`.
+
+    If `github issues: archive closed issues` is True in the config, feedback
+    whose issue was closed is also archived.
+
+    Args:
+        issues: dicts with the issue's `html_url`, its `state` ("open" or
+            "closed"), and when it was closed (`closed_at`, a datetime or None)
+
+    Returns:
+        how many feedback rows were updated
+    """
+    archive_closed = (get_config("github issues") or {}).get(
+        "archive closed issues", False
+    )
+    updates: Dict[str, Dict[str, Any]] = {}
+    for issue in issues:
+        values = {"issue_state": issue["state"], "closed_at": issue.get("closed_at")}
+        if archive_closed and issue["state"] == "closed":
+            values["archived"] = True
+        updates[issue["html_url"]] = values
+    if not updates:
+        return 0
+    rowcount = _feedback_storage().update_feedback_by_issue(updates)
+    if rowcount:
+        _bump_data_version("feedback")
+    return rowcount
+
+
+def mark_archived(id_for_feedback: str) -> bool:
+    if not _feedback_storage().update_feedback(
+        {str(id_for_feedback): {"archived": True}}
+    ):
         log(f"Cannot find {id_for_feedback} in DB")
         return False
+    _bump_data_version("feedback")
     return True
 
 
 def get_all_feedback_info(interview=None, include_archived=False) -> Iterable:
-    stmt = select(feedback_session_table)
+    return _feedback_storage().get_all_feedback_info(
+        interview=interview, include_archived=include_archived
+    )
+
+
+def get_feedback_hotspots(
+    interview: Optional[str] = None,
+    *,
+    version: Optional[str] = None,
+    include_archived=False,
+    limit: int = 10,
+) -> List[Dict[str, Any]]:
+    """Retrieves the questions that got the most feedback, per interview and
+    package version, most feedback first.
+
+    Only feedback that recorded a question ID is counted.
+    """
+    stmt = select(
+        feedback_session_table.c.interview,
+        feedback_session_table.c.package_version,
+        feedback_session_table.c.question_id,
+        func.count().label("count"),
+        func.max(feedback_session_table.c.datetime).label("latest"),
+    ).where(feedback_session_table.c.question_id != None)
     if interview:
         stmt = stmt.where(feedback_session_table.c.interview == interview)
+    if version:
+        stmt = stmt.where(feedback_session_table.c.package_version == version)
     if not include_archived:
         stmt = stmt.where(feedback_session_table.c.archived == False)
-    with engine.begin() as conn:
-        results = conn.execute(stmt)
-        # Turn into literal dict because DA is too eager to save / load SQLAlchemy objects into the interview SQL
-        return {str(row["id"]): dict(row) for row in results.mappings()}
+    stmt = (
+        stmt.group_by(
+            feedback_session_table.c.interview,
+            feedback_session_table.c.package_version,
+            feedback_session_table.c.question_id,
+        )
+        .order_by(desc("count"), desc("latest"))
+        .limit(limit)
+    )
+    with engine.connect() as conn:
+        return [dict(row) for row in conn.execute(stmt).mappings()]
 
 
 def save_good_or_bad(
@@ -223,13 +794,23 @@ def save_good_or_bad(
     user_info_object=None,
     interview: Optional[str] = None,
     version: Optional[str] = None,
-) -> None:
+    session_id: Optional[str] = None,
+) -> bool:
     """Saves a user's reaction to an interview, in the form of an int (0 being
-    neutral, positive numbers being good, and negative numbers being bad)"""
+    neutral, positive numbers being good, and negative numbers being bad)
+
+    If a session ID is known (passed directly or from `user_info_object`), only
+    the first reaction from that session to a given interview version is saved;
+    duplicates are dropped in Redis without touching the database.
+
+    Returns True if the reaction was saved, False if it was a duplicate.
+    """
     _package_version = None
     _interview = None
+    _session_id = None
     if user_info_object:
         _interview = user_info_object.filename
+        _session_id = getattr(user_info_object, "session", None)
         try:
             _package_version = str(
                 importlib.import_module(user_info_object.package).__version__
@@ -241,32 +822,661 @@ def save_good_or_bad(
         _interview = interview
     if version:
         _package_version = version
+    if session_id:
+        _session_id = session_id
 
-    stmt = insert(good_or_bad_table).values(
-        reaction=reaction,
-        interview=_interview,
-        version=_package_version,
-        datetime=datetime.now(),
-    )
-    with engine.begin() as conn:
-        conn.execute(stmt)
+    if not _is_first_reaction(_session_id, _interview, _package_version):
+        return False
+
+    _reaction_storage().save_good_or_bad(reaction, _interview, _package_version)
+    _bump_data_version("reactions")
+    return True
 
 
 def get_good_or_bad(interview: Optional[str] = None) -> List:
     """Retrieves user's aggregate reactions to an interview (how many reactions
     and the average score of them), grouped by interview and package version"""
+    return _reaction_storage().get_good_or_bad(interview)
+
+
+# How far back trends look by default, per bucket size, to keep queries bounded
+_TREND_DEFAULT_SPANS = {"hour": timedelta(days=2), "day": timedelta(days=30)}
+
+
+def _time_bucket(column, bucket: str):
+    if engine.dialect.name == "sqlite":
+        formats = {"hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00"}
+        return func.strftime(formats[bucket], column)
+    return func.date_trunc(bucket, column)
+
+
+def _bucket_start(value) -> datetime:
+    # SQLite's strftime gives a string, Postgres's date_trunc a datetime
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def get_good_or_bad_trend(
+    interview: Optional[str] = None,
+    *,
+    bucket: str = "day",
+    since: Optional[datetime] = None,
+    window: int = 7,
+) -> List[Dict[str, Any]]:
+    """Retrieves reactions in hourly or daily buckets, per interview and version.
+
+    Each row has the `bucket`'s start (a datetime, on every database), its
+    `count` and `average`, and a `moving_average`
+    over the last `window` buckets that had reactions (weighted by how many
+    reactions each bucket had). Buckets without reactions are skipped, not
+    counted as empty, so on a quiet interview the window covers more time.
+    Only reactions newer than `since` are read, which defaults to the last 30
+    days for daily buckets and 2 days for hourly buckets.
+    """
+    if bucket not in _TREND_DEFAULT_SPANS:
+        raise ValueError(
+            f"bucket must be one of {list(_TREND_DEFAULT_SPANS)}, not {bucket}"
+        )
+    if since is None:
+        since = datetime.now() - _TREND_DEFAULT_SPANS[bucket]
+
+    bucket_column = _time_bucket(good_or_bad_table.c.datetime, bucket)
+    per_bucket = select(
+        good_or_bad_table.c.interview,
+        good_or_bad_table.c.version,
+        bucket_column.label("bucket"),
+        func.count().label("count"),
+        # Sums of integers are numeric (Decimal) on Postgres; use floats everywhere
+        cast(func.sum(good_or_bad_table.c.reaction), Float).label("total"),
+    ).where(good_or_bad_table.c.datetime >= since)
+    if interview:
+        per_bucket = per_bucket.where(good_or_bad_table.c.interview == interview)
+    per_bucket = per_bucket.group_by(
+        good_or_bad_table.c.interview, good_or_bad_table.c.version, bucket_column
+    ).subquery()
+
+    moving_window = {
+        "partition_by": [per_bucket.c.interview, per_bucket.c.version],
+        "order_by": per_bucket.c.bucket,
+        "rows": (-(max(window, 1) - 1), 0),
+    }
+    stmt = select(
+        per_bucket.c.interview,
+        per_bucket.c.version,
+        per_bucket.c.bucket,
+        per_bucket.c.count,
+        per_bucket.c.total,
+        cast(func.sum(per_bucket.c.total).over(**moving_window), Float).label(
+            "window_total"
+        ),
+        cast(func.sum(per_bucket.c.count).over(**moving_window), Float).label(
+            "window_count"
+        ),
+    ).order_by(
+        asc(per_bucket.c.interview),
+        desc(per_bucket.c.version),
+        asc(per_bucket.c.bucket),
+    )
+    with engine.connect() as conn:
+        return [
+            {
+                "interview": row["interview"],
+                "version": row["version"],
+                "bucket": _bucket_start(row["bucket"]),
+                "count": row["count"],
+                "average": row["total"] / row["count"],
+                "moving_average": row["window_total"] / row["window_count"],
+            }
+            for row in conn.execute(stmt).mappings()
+        ]
+
+
+def compare_good_or_bad_versions(
+    interview: Optional[str] = None,
+    *,
+    since: Optional[datetime] = None,
+    z: float = 1.96,
+) -> List[Dict[str, Any]]:
+    """Compares the average reaction of each version of an interview, with a
+    confidence interval (95% by default) for each average.
+
+    The variance is computed from the count, sum and sum of squares in SQL, so
+    only one row per version is sent back from the database.
+    """
     stmt = select(
         good_or_bad_table.c.interview,
         good_or_bad_table.c.version,
         func.count().label("count"),
-        func.avg(good_or_bad_table.c.reaction).label("average"),
+        cast(func.sum(good_or_bad_table.c.reaction), Float).label("total"),
+        cast(
+            func.sum(good_or_bad_table.c.reaction * good_or_bad_table.c.reaction),
+            Float,
+        ).label("total_squares"),
+        func.min(good_or_bad_table.c.datetime).label("first_reaction"),
+        func.max(good_or_bad_table.c.datetime).label("last_reaction"),
     )
     if interview:
         stmt = stmt.where(good_or_bad_table.c.interview == interview)
+    if since:
+        stmt = stmt.where(good_or_bad_table.c.datetime >= since)
     stmt = stmt.group_by(good_or_bad_table.c.interview, good_or_bad_table.c.version)
     stmt = stmt.order_by(
         asc(good_or_bad_table.c.interview), desc(good_or_bad_table.c.version)
     )
-    with engine.begin() as conn:
-        results = conn.execute(stmt)
-        return [dict(row) for row in results.mappings()]
+    comparison = []
+    with engine.connect() as conn:
+        for row in conn.execute(stmt).mappings():
+            count = row["count"]
+            average = row["total"] / count
+            if count > 1:
+                variance = (row["total_squares"] - count * average * average) / (
+                    count - 1
+                )
+                margin = z * math.sqrt(max(variance, 0) / count)
+            else:
+                margin = float("inf")
+            comparison.append(
+                {
+                    "interview": row["interview"],
+                    "version": row["version"],
+                    "count": count,
+                    "average": average,
+                    "ci_low": average - margin,
+                    "ci_high": average + margin,
+                    "first_reaction": row["first_reaction"],
+                    "last_reaction": row["last_reaction"],
+                }
+            )
+    return comparison
+
+
+def _load_themes(conn, interview: str) -> List[FeedbackTheme]:
+    stmt = select(feedback_cluster_table).where(
+        feedback_cluster_table.c.interview == interview
+    )
+    return [
+        FeedbackTheme(
+            row["id"],
+            np.frombuffer(row["centroid"], dtype=np.float32).copy(),
+            row["size"],
+            json.loads(row["terms"] or "{}"),
+            row["representative_id"],
+        )
+        for row in conn.execute(stmt).mappings()
+    ]
+
+
+def _save_themes(conn, interview: str, themes: List[FeedbackTheme]) -> None:
+    for theme in themes:
+        if not theme.changed:
+            continue
+        values = {
+            "interview": interview,
+            "size": theme.size,
+            "label": theme.label(),
+            "terms": json.dumps(theme.top_terms()),
+            "centroid": theme.centroid.astype(np.float32).tobytes(),
+            "representative_id": theme.representative_id,
+            "datetime": datetime.now(),
+        }
+        if theme.theme_id is None:
+            result = conn.execute(insert(feedback_cluster_table).values(**values))
+            theme.theme_id = result.inserted_primary_key[0]
+        else:
+            conn.execute(
+                update(feedback_cluster_table)
+                .where(feedback_cluster_table.c.id == theme.theme_id)
+                .values(**values)
+            )
+        theme.changed = False
+
+
+# The columns needed to get just the user's text, for themes
+_feedback_text_columns = [
+    feedback_session_table.c.id,
+    feedback_session_table.c.body,
+    feedback_session_table.c.details,
+    feedback_session_table.c.details_compressed,
+]
+
+
+def _feedback_text_from_row(row) -> str:
+    return feedback_text(_decompress_details(dict(row._mapping)))
+
+
+# The cluster_id of feedback with no words to cluster on, so it isn't read again.
+# Theme ids start at 1, so this never matches a theme.
+NO_TEXT_CLUSTER_ID = 0
+
+
+def cluster_feedback(
+    interview: Optional[str] = None,
+    *,
+    threshold: float = 0.35,
+    batch_size: int = 500,
+) -> int:
+    """Groups feedback that isn't in a theme yet into themes, per interview.
+
+    Meant to be run as a background / scheduled job: only new feedback is read,
+    and existing themes are updated in place. Each batch is saved in its own
+    transaction.
+
+    Feedback with no words left after tokenizing gets a `cluster_id` of
+    `NO_TEXT_CLUSTER_ID` instead of a theme.
+
+    Returns:
+        how many feedback rows were put into a theme
+    """
+    interviews_stmt = (
+        select(feedback_session_table.c.interview)
+        .where(feedback_session_table.c.cluster_id == None)
+        .distinct()
+    )
+    if interview:
+        interviews_stmt = interviews_stmt.where(
+            feedback_session_table.c.interview == interview
+        )
+    with engine.connect() as conn:
+        interviews = [row[0] for row in conn.execute(interviews_stmt)]
+
+    clustered = 0
+    for interview_to_cluster in interviews:
+        last_id = 0
+        while True:
+            with engine.begin() as conn:
+                themes = _load_themes(conn, interview_to_cluster)
+                rows = conn.execute(
+                    select(*_feedback_text_columns)
+                    .where(
+                        feedback_session_table.c.interview == interview_to_cluster,
+                        feedback_session_table.c.cluster_id == None,
+                        feedback_session_table.c.id > last_id,
+                    )
+                    .order_by(asc(feedback_session_table.c.id))
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                assignments = assign_themes(
+                    themes,
+                    [(row.id, _feedback_text_from_row(row)) for row in rows],
+                    threshold=threshold,
+                )
+                _save_themes(conn, interview_to_cluster, themes)
+                theme_ids = {
+                    feedback_id: theme.theme_id for feedback_id, theme in assignments
+                }
+                conn.execute(
+                    update(feedback_session_table)
+                    .where(feedback_session_table.c.id == bindparam("feedback_id"))
+                    .values(cluster_id=bindparam("theme_id")),
+                    [
+                        {
+                            "feedback_id": row.id,
+                            "theme_id": theme_ids.get(row.id, NO_TEXT_CLUSTER_ID),
+                        }
+                        for row in rows
+                    ],
+                )
+                clustered += len(assignments)
+    if clustered:
+        _bump_data_version("feedback")
+    return clustered
+
+
+def get_feedback_clusters(
+    interview: Optional[str] = None, include_archived=False, samples: int = 3
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Retrieves the themes found by `cluster_feedback`, biggest first, with how
+    much (un-archived, by default) feedback is in each and a few sample bodies.
+
+    Returns:
+        a dict of interview names to a list of themes
+    """
+    count_stmt = select(
+        feedback_session_table.c.cluster_id, func.count().label("count")
+    ).where(feedback_session_table.c.cluster_id != None)
+    if interview:
+        count_stmt = count_stmt.where(feedback_session_table.c.interview == interview)
+    if not include_archived:
+        count_stmt = count_stmt.where(feedback_session_table.c.archived == False)
+    count_stmt = count_stmt.group_by(feedback_session_table.c.cluster_id).subquery()
+
+    stmt = (
+        select(
+            feedback_cluster_table.c.id,
+            feedback_cluster_table.c.interview,
+            feedback_cluster_table.c.label,
+            feedback_cluster_table.c.representative_id,
+            count_stmt.c.count,
+        )
+        .join(count_stmt, count_stmt.c.cluster_id == feedback_cluster_table.c.id)
+        .order_by(asc(feedback_cluster_table.c.interview), desc(count_stmt.c.count))
+    )
+
+    # The representative feedback first, then the newest, for every theme at once
+    sample_rank = (
+        func.row_number()
+        .over(
+            partition_by=feedback_session_table.c.cluster_id,
+            order_by=[
+                case(
+                    (
+                        feedback_session_table.c.id
+                        == feedback_cluster_table.c.representative_id,
+                        0,
+                    ),
+                    else_=1,
+                ),
+                desc(feedback_session_table.c.id),
+            ],
+        )
+        .label("sample_rank")
+    )
+    ranked = select(
+        feedback_session_table.c.cluster_id, *_feedback_text_columns, sample_rank
+    ).join(
+        feedback_cluster_table,
+        feedback_cluster_table.c.id == feedback_session_table.c.cluster_id,
+    )
+    if interview:
+        ranked = ranked.where(feedback_session_table.c.interview == interview)
+    if not include_archived:
+        ranked = ranked.where(feedback_session_table.c.archived == False)
+    ranked = ranked.subquery()
+    samples_stmt = (
+        select(ranked)
+        .where(ranked.c.sample_rank <= samples)
+        .order_by(asc(ranked.c.cluster_id), asc(ranked.c.sample_rank))
+    )
+
+    clusters: Dict[str, List[Dict[str, Any]]] = {}
+    with engine.connect() as conn:
+        samples_by_theme: Dict[int, List[str]] = {}
+        for sample in conn.execute(samples_stmt):
+            samples_by_theme.setdefault(sample.cluster_id, []).append(
+                _feedback_text_from_row(sample)
+            )
+        for row in conn.execute(stmt).mappings():
+            clusters.setdefault(row["interview"], []).append(
+                {
+                    "id": row["id"],
+                    "label": row["label"],
+                    "count": row["count"],
+                    "samples": samples_by_theme.get(row["id"], []),
+                }
+            )
+    return clusters
+
+
+############################################
+## The admin dashboard's queries are cached in Redis. Each kind of data has a
+## version counter that is bumped whenever it is written, and the counter is
+## part of the cache key, so a write makes the old results unreachable
+## (they expire on their own) instead of having to find and delete them.
+
+
+def _bump_data_version(kind: str) -> None:
+    try:
+        DARedis().incr(f"{redis_data_version_prefix}:{kind}")
+    except Exception as ex:
+        log(f"feedback_on_server: unable to bump the {kind} data version: {ex}")
+
+
+_DASHBOARD_QUERIES = {
+    "good_or_bad": ("reactions", get_good_or_bad),
+    "good_or_bad_trend": ("reactions", get_good_or_bad_trend),
+    "compare_good_or_bad_versions": ("reactions", compare_good_or_bad_versions),
+    "all_feedback_info": ("feedback", get_all_feedback_info),
+    "feedback_hotspots": ("feedback", get_feedback_hotspots),
+    "feedback_clusters": ("feedback", get_feedback_clusters),
+}
+
+
+def get_dashboard_data(query: str, **kwargs) -> Any:
+    """Runs one of the admin dashboard's queries, reusing the last result until
+    the data it reads from changes.
+
+    Args:
+        query: one of "good_or_bad", "good_or_bad_trend", "compare_good_or_bad_versions",
+            "all_feedback_info", "feedback_hotspots" or "feedback_clusters"
+        kwargs: keyword arguments for the function of the same name
+    """
+    kind, query_function = _DASHBOARD_QUERIES[query]
+    try:
+        red = DARedis()
+        version = red.get(f"{redis_data_version_prefix}:{kind}") or 0
+        if isinstance(version, bytes):
+            version = version.decode()
+        args_key = json.dumps(kwargs, sort_keys=True, default=str)
+        cache_key = f"{redis_dashboard_cache_prefix}:{query}:{version}:{args_key}"
+        cached = red.get_data(cache_key)
+        if cached is not None:
+            return cached
+    except Exception as ex:
+        log(f"feedback_on_server: unable to read the dashboard cache: {ex}")
+        return query_function(**kwargs)
+
+    result = query_function(**kwargs)
+    try:
+        red.set_data(cache_key, result, expire=DASHBOARD_CACHE_SECONDS)
+    except Exception as ex:
+        log(f"feedback_on_server: unable to save to the dashboard cache: {ex}")
+    return result
+
+
+############################################
+## When an issue can't be made on GitHub, it is queued in Redis twice: once to
+## be sent to GitHub again later (see `replay_failed_issues`), and once per
+## repository to be emailed in a digest (see `send_failed_issue_digest`), so a
+## GitHub outage sends one email per repository per interval instead of one
+## email per submission.
+
+
+def _digest_minutes() -> int:
+    return int((get_config("github issues") or {}).get("error digest minutes", 60))
+
+
+def queue_failed_issue(
+    repo_owner: str,
+    repo_name: str,
+    *,
+    title: Optional[str] = None,
+    body: Optional[str] = None,
+    label: Optional[str] = None,
+    feedback_id: Optional[str] = None,
+    email_digest: bool = True,
+) -> None:
+    """Saves an issue that couldn't be made on GitHub, to be retried and emailed later.
+
+    Issues for repository owners that aren't allowed are dropped, since they can
+    never be made.
+
+    Args:
+        feedback_id: the id from `save_feedback_info`, to link to the issue once it is made
+        email_digest: if False, the issue is only retried, not included in the next digest email
+    """
+    if repo_owner.lower() not in _get_allowed_repo_owners():
+        log(
+            f"feedback_on_server: not queueing an issue for {repo_owner}/{repo_name}, "
+            f"{repo_owner} is not in `allowed repository owners`"
+        )
+        return
+    item = json.dumps(
+        {
+            "repo_owner": repo_owner,
+            "repo_name": repo_name,
+            "title": title,
+            "body": body,
+            "label": label,
+            "feedback_id": str(feedback_id) if feedback_id else None,
+            "datetime": datetime.now().isoformat(),
+        }
+    )
+    repo = f"{repo_owner}/{repo_name}"
+    red = DARedis()
+    repos_key = f"{redis_failed_issue_digest_prefix}:repos"
+    if email_digest and not (
+        red.sismember(repos_key, repo) or red.scard(repos_key) < MAX_DIGEST_REPOS
+    ):
+        log(
+            f"feedback_on_server: {MAX_DIGEST_REPOS} repositories already have a digest "
+            f"waiting, so the failed issue for {repo} is only queued to be sent again"
+        )
+        email_digest = False
+    pipe = red.pipeline()
+    pipe.rpush(redis_failed_issues_key, item)
+    pipe.ltrim(redis_failed_issues_key, -MAX_FAILED_ISSUES, -1)
+    if email_digest:
+        items_key = f"{redis_failed_issue_digest_prefix}:items:{repo}"
+        pipe.rpush(items_key, item)
+        pipe.ltrim(items_key, -MAX_DIGEST_ITEMS, -1)
+        pipe.sadd(repos_key, repo)
+    pipe.execute()
+
+
+def failed_issue_count() -> int:
+    """How many issues are waiting to be sent to GitHub again"""
+    return DARedis().llen(redis_failed_issues_key)
+
+
+def _digest_body(repo: str, items: List[Dict[str, Any]]) -> str:
+    lines = [
+        f"{len(items)} feedback submissions could not be made into issues on the "
+        f"{repo} GitHub repository. They will be sent to GitHub again when "
+        "replay_failed_issues() runs. Check the GitHub token and the "
+        "`github issues` config.",
+        "",
+    ]
+    if len(items) >= MAX_DIGEST_ITEMS:
+        lines += [
+            f"There may be more; only the last {MAX_DIGEST_ITEMS} are listed.",
+            "",
+        ]
+    for item in items:
+        lines += [
+            "-" * 40,
+            f"{item.get('datetime')}: {item.get('title') or 'User feedback'}",
+            "",
+            item.get("body") or "",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def send_failed_issue_digest(to: str, *, force: bool = False) -> int:
+    """Emails the issues that couldn't be made on GitHub, one email per repository.
+
+    Each repository gets at most one email per `github issues: error digest minutes`
+    (60 by default), so this is cheap to call after every failure; issues that
+    fail in between are held for the next digest. Pass `force=True` to send
+    everything that is waiting now.
+
+    Returns:
+        how many emails were sent
+    """
+    red = DARedis()
+    interval = max(_digest_minutes(), 1) * 60
+    sent = 0
+    for repo in red.smembers(f"{redis_failed_issue_digest_prefix}:repos"):
+        repo = repo.decode("utf-8") if isinstance(repo, bytes) else repo
+        sent_key = f"{redis_failed_issue_digest_prefix}:sent:{repo}"
+        if force:
+            red.set(sent_key, 1, ex=interval)
+        elif not red.set(sent_key, 1, nx=True, ex=interval):
+            continue  # already sent a digest for this repo in this interval
+
+        items_key = f"{redis_failed_issue_digest_prefix}:items:{repo}"
+        pipe = red.pipeline()
+        pipe.lrange(items_key, 0, -1)
+        pipe.delete(items_key)
+        pipe.srem(f"{redis_failed_issue_digest_prefix}:repos", repo)
+        raw_items = pipe.execute()[0]
+        if not raw_items:
+            continue
+        items = [json.loads(raw_item) for raw_item in raw_items]
+        if send_email(
+            to=to,
+            subject=f"{repo} - {len(items)} feedback submissions could not be sent to GitHub",
+            body=_digest_body(repo, items),
+        ):
+            sent += 1
+        else:
+            log(f"feedback_on_server: could not email the digest for {repo} to {to}")
+            pipe = red.pipeline()
+            pipe.rpush(items_key, *raw_items)
+            pipe.sadd(f"{redis_failed_issue_digest_prefix}:repos", repo)
+            pipe.delete(sent_key)
+            pipe.execute()
+    return sent
+
+
+def replay_failed_issues(*, batch_size: int = 100, max_concurrency: int = 4) -> int:
+    """Tries again to make the issues that couldn't be made on GitHub, e.g. once
+    GitHub or the token is working again. Issues that fail again stay queued,
+    unless they have already been tried MAX_REPLAY_ATTEMPTS times, or their
+    repository owner isn't allowed anymore; those are dropped and logged.
+
+    Returns:
+        how many issues were made
+    """
+    red = DARedis()
+    pipe = red.pipeline()
+    pipe.lrange(redis_failed_issues_key, 0, batch_size - 1)
+    pipe.ltrim(redis_failed_issues_key, batch_size, -1)
+    raw_items = pipe.execute()[0]
+    if not raw_items:
+        return 0
+    items = []
+    allowed_owners = _get_allowed_repo_owners()
+    for raw_item in raw_items:
+        item = json.loads(raw_item)
+        if (item.get("repo_owner") or "").lower() in allowed_owners:
+            items.append(item)
+        else:
+            _drop_failed_issue(item, "its owner is not in `allowed repository owners`")
+
+    urls: List[Optional[str]] = [None] * len(items)
+    by_label: Dict[Optional[str], List[int]] = {}
+    for index, item in enumerate(items):
+        by_label.setdefault(item.get("label"), []).append(index)
+    try:
+        for label, indices in by_label.items():
+            label_urls = make_github_issues(
+                [items[index] for index in indices],
+                label=label,
+                max_concurrency=max_concurrency,
+            )
+            for index, url in zip(indices, label_urls):
+                urls[index] = url
+    finally:
+        # Requeue what wasn't made, even when making the issues raised, so none is lost
+        still_failing = []
+        for item, url in zip(items, urls):
+            if url:
+                continue
+            item["attempts"] = item.get("attempts", 0) + 1
+            if item["attempts"] >= MAX_REPLAY_ATTEMPTS:
+                _drop_failed_issue(item, f"it failed {item['attempts']} times")
+            else:
+                still_failing.append(json.dumps(item))
+        if still_failing:
+            red.rpush(redis_failed_issues_key, *still_failing)
+        set_feedback_github_urls(
+            {
+                item["feedback_id"]: url
+                for item, url in zip(items, urls)
+                if url and item.get("feedback_id")
+            }
+        )
+    return sum(1 for url in urls if url)
+
+
+def _drop_failed_issue(item: Dict[str, Any], reason: str) -> None:
+    log(
+        f"feedback_on_server: not sending the failed issue for "
+        f"{item.get('repo_owner')}/{item.get('repo_name')} from {item.get('datetime')} "
+        f"to GitHub again, since {reason}: {item.get('title')}"
+    )
@@ -0,0 +1,541 @@
+import fcntl
+import json
+import os
+import re
+import uuid
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from docassemble.base.util import DARedis, log
+
+__all__ = [
+    "FeedbackStorage",
+    "RedisStreamFeedbackStorage",
+    "JSONLFeedbackStorage",
+]
+
+
+class FeedbackStorage(ABC):
+    """Where feedback and reactions are saved. See `feedback_on_server` for the SQL
+    version, which is the default, and which is the only one that supports the
+    trend, hot spot and theme queries.
+
+    Feedback rows are dicts with the same keys as the columns of the
+    `feedback_session` table; reactions have the keys of the `good_or_bad` table.
+    """
+
+    @abstractmethod
+    def save_feedback(self, values: Dict[str, Any]) -> Optional[str]:
+        """Saves a new feedback row, returning its id"""
+
+    @abstractmethod
+    def update_feedback(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """Changes columns of existing feedback rows.
+
+        Args:
+            updates: a dict of feedback ids to the new values for that row
+
+        Returns:
+            how many rows were found and changed
+        """
+
+    @abstractmethod
+    def get_all_feedback_info(
+        self, interview: Optional[str] = None, include_archived=False
+    ) -> Dict[str, Dict[str, Any]]:
+        """Retrieves feedback rows keyed by id, optionally only for one interview"""
+
+    def get_feedback(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Retrieves specific feedback rows, archived or not"""
+        wanted = {str(feedback_id) for feedback_id in ids}
+        return {
+            feedback_id: row
+            for feedback_id, row in self.get_all_feedback_info(
+                include_archived=True
+            ).items()
+            if feedback_id in wanted
+        }
+
+    def update_feedback_by_issue(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """Changes columns of the feedback rows linked to GitHub issues.
+
+        Args:
+            updates: a dict of issue URLs (the `html_url` column) to the new values
+                for the rows linked to that issue
+
+        Returns:
+            how many rows were found and changed
+        """
+        by_id = {
+            feedback_id: updates[row["html_url"]]
+            for feedback_id, row in self.get_all_feedback_info(
+                include_archived=True
+            ).items()
+            if row.get("html_url") in updates
+        }
+        return self.update_feedback(by_id) if by_id else 0
+
+    @abstractmethod
+    def save_good_or_bad(
+        self, reaction: int, interview: Optional[str], version: Optional[str]
+    ) -> None:
+        """Saves a reaction to an interview (an int: 0 is neutral, above is good, below is bad)"""
+
+    @abstractmethod
+    def get_good_or_bad(self, interview: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Counts and averages the reactions per interview and version"""
+
+
+def _include_feedback(
+    row: Dict[str, Any], interview: Optional[str], include_archived: bool
+) -> bool:
+    if interview and row.get("interview") != interview:
+        return False
+    return include_archived or not row.get("archived")
+
+
+def _reaction_rows(
+    totals: Dict[Tuple[Optional[str], Optional[str]], List[int]],
+    interview: Optional[str],
+) -> List[Dict[str, Any]]:
+    """Turns {(interview, version): [count, sum]} into rows like `get_good_or_bad`'s,
+    sorted the same way (interview ascending, then version descending)"""
+    rows = [
+        {
+            "interview": row_interview,
+            "version": version,
+            "count": count,
+            "average": total / count,
+        }
+        for (row_interview, version), (count, total) in totals.items()
+        if count and (not interview or row_interview == interview)
+    ]
+    rows.sort(key=lambda row: row["version"] or "", reverse=True)
+    rows.sort(key=lambda row: row["interview"] or "")
+    return rows
+
+
+# Columns that are saved as ISO 8601 strings and read back as datetimes
+_DATETIME_KEYS = ["datetime", "closed_at"]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value)} is not JSON serializable")
+
+
+def _to_json(value) -> str:
+    return json.dumps(value, default=_json_default)
+
+
+def _parse_datetimes(values: Dict[str, Any]) -> Dict[str, Any]:
+    for key in _DATETIME_KEYS:
+        if isinstance(values.get(key), str):
+            values[key] = datetime.fromisoformat(values[key])
+    return values
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _from_json(text) -> Dict[str, Any]:
+    values = _parse_datetimes(json.loads(_decode(text)))
+    if isinstance(values.get("values"), dict):
+        _parse_datetimes(values["values"])
+    return values
+
+
+############################################
+## Redis: feedback is appended to a stream, with later changes to a row kept in
+## a hash per row, and the ids of the rows linked to an issue kept in a set per
+## issue URL. Reactions are appended to a capped stream (for the raw events) and
+## counted in two hashes, so reading the totals is one round trip.
+
+# Stream entry ids look like "1700000000000-0"; anything else is an error to XRANGE
+_STREAM_ID_RE = re.compile(r"^\d+-\d+$")
+
+
+class RedisStreamFeedbackStorage(FeedbackStorage):
+    def __init__(
+        self,
+        prefix: str = "docassemble-GithubFeedbackForm:storage",
+        max_reaction_events: int = 100000,
+    ):
+        self.feedback_stream_key = f"{prefix}:feedback"
+        self.feedback_updates_prefix = f"{prefix}:feedback_updates"
+        self.feedback_by_issue_prefix = f"{prefix}:feedback_by_issue"
+        self.reaction_stream_key = f"{prefix}:reactions"
+        self.reaction_counts_key = f"{prefix}:reaction_counts"
+        self.reaction_sums_key = f"{prefix}:reaction_sums"
+        self.max_reaction_events = max_reaction_events
+
+    def save_feedback(self, values: Dict[str, Any]) -> Optional[str]:
+        red = DARedis()
+        feedback_id = _decode(
+            red.xadd(self.feedback_stream_key, {"data": _to_json(values)})
+        )
+        if values.get("html_url"):
+            red.sadd(
+                f"{self.feedback_by_issue_prefix}:{values['html_url']}", feedback_id
+            )
+        return feedback_id
+
+    def update_feedback(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        red = DARedis()
+        ids = [
+            feedback_id for feedback_id in updates if _STREAM_ID_RE.match(feedback_id)
+        ]
+        if len(ids) < len(updates):
+            log(
+                f"Skipping feedback ids that aren't Redis stream ids: {sorted(set(updates) - set(ids))}"
+            )
+        pipe = red.pipeline()
+        for feedback_id in ids:
+            pipe.xrange(self.feedback_stream_key, feedback_id, feedback_id)
+        exists = [bool(found) for found in pipe.execute()]
+
+        pipe = red.pipeline()
+        for feedback_id, found in zip(ids, exists):
+            if found:
+                pipe.hset(
+                    f"{self.feedback_updates_prefix}:{feedback_id}",
+                    mapping={
+                        key: _to_json(value)
+                        for key, value in updates[feedback_id].items()
+                    },
+                )
+                if updates[feedback_id].get("html_url"):
+                    pipe.sadd(
+                        f"{self.feedback_by_issue_prefix}:{updates[feedback_id]['html_url']}",
+                        feedback_id,
+                    )
+        pipe.execute()
+        return sum(exists)
+
+    def update_feedback_by_issue(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        red = DARedis()
+        pipe = red.pipeline()
+        for html_url in updates:
+            pipe.smembers(f"{self.feedback_by_issue_prefix}:{html_url}")
+        candidates = [
+            (html_url, _decode(feedback_id))
+            for html_url, members in zip(updates, pipe.execute())
+            for feedback_id in members
+        ]
+        if not candidates:
+            return 0
+
+        # A row that was later linked to another issue stays in its old issue's
+        # set, so check each candidate's current URL (a change wins over the
+        # value it was saved with)
+        pipe = red.pipeline()
+        for _, feedback_id in candidates:
+            pipe.hget(f"{self.feedback_updates_prefix}:{feedback_id}", "html_url")
+            pipe.xrange(self.feedback_stream_key, feedback_id, feedback_id)
+        results = pipe.execute()
+        by_id = {}
+        stale = red.pipeline()
+        for (html_url, feedback_id), changed_url, entries in zip(
+            candidates, results[::2], results[1::2]
+        ):
+            if changed_url is not None:
+                current_url = json.loads(changed_url)
+            elif entries:
+                fields = entries[0][1]
+                current_url = _from_json(fields.get(b"data", fields.get("data"))).get(
+                    "html_url"
+                )
+            else:
+                current_url = None
+            if current_url == html_url:
+                by_id[feedback_id] = updates[html_url]
+            else:
+                stale.srem(f"{self.feedback_by_issue_prefix}:{html_url}", feedback_id)
+        stale.execute()
+        return self.update_feedback(by_id) if by_id else 0
+
+    def _stream_feedback(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        red = DARedis()
+        start = "-"
+        while True:
+            entries = red.xrange(self.feedback_stream_key, start, "+", count=1000)
+            if not entries:
+                return
+            pipe = red.pipeline()
+            for entry_id, _ in entries:
+                pipe.hgetall(f"{self.feedback_updates_prefix}:{_decode(entry_id)}")
+            for (entry_id, fields), changes in zip(entries, pipe.execute()):
+                entry_id = _decode(entry_id)
+                row = _from_json(fields.get(b"data", fields.get("data")))
+                row.update(
+                    _parse_datetimes(
+                        {
+                            _decode(key): json.loads(value)
+                            for key, value in (changes or {}).items()
+                        }
+                    )
+                )
+                row["id"] = entry_id
+                yield entry_id, row
+            start = "(" + _decode(entries[-1][0])
+
+    def get_all_feedback_info(
+        self, interview: Optional[str] = None, include_archived=False
+    ) -> Dict[str, Dict[str, Any]]:
+        return {
+            feedback_id: row
+            for feedback_id, row in self._stream_feedback()
+            if _include_feedback(row, interview, include_archived)
+        }
+
+    def save_good_or_bad(
+        self, reaction: int, interview: Optional[str], version: Optional[str]
+    ) -> None:
+        field = json.dumps([interview, version])
+        pipe = DARedis().pipeline()
+        pipe.xadd(
+            self.reaction_stream_key,
+            {
+                "data": _to_json(
+                    {
+                        "reaction": reaction,
+                        "interview": interview,
+                        "version": version,
+                        "datetime": datetime.now(),
+                    }
+                )
+            },
+            maxlen=self.max_reaction_events,
+            approximate=True,
+        )
+        pipe.hincrby(self.reaction_counts_key, field, 1)
+        pipe.hincrby(self.reaction_sums_key, field, reaction)
+        pipe.execute()
+
+    def get_good_or_bad(self, interview: Optional[str] = None) -> List[Dict[str, Any]]:
+        pipe = DARedis().pipeline()
+        pipe.hgetall(self.reaction_counts_key)
+        pipe.hgetall(self.reaction_sums_key)
+        counts, sums = pipe.execute()
+        sums = {_decode(field): int(total) for field, total in sums.items()}
+        totals = {}
+        for field, count in counts.items():
+            field = _decode(field)
+            row_interview, version = json.loads(field)
+            totals[(row_interview, version)] = [int(count), sums.get(field, 0)]
+        return _reaction_rows(totals, interview)
+
+
+############################################
+## Local append-only JSONL files: every save and every change is a new line.
+## Every `compact_every` writes, a file is rewritten with changes folded into
+## their rows and reactions folded into per (interview, version) totals.
+## Each instance keeps the feedback ids and their issue URLs in memory, reading
+## only the lines added since it last looked, so that changing a row doesn't
+## read the whole file; the index is rebuilt when the file is compacted.
+
+
+class JSONLFeedbackStorage(FeedbackStorage):
+    def __init__(self, directory: str, compact_every: int = 1000):
+        os.makedirs(directory, exist_ok=True)
+        self.feedback_path = os.path.join(directory, "feedback.jsonl")
+        self.reactions_path = os.path.join(directory, "reactions.jsonl")
+        self.compact_every = compact_every
+        self._writes = {self.feedback_path: 0, self.reactions_path: 0}
+        self._issue_by_id: Dict[str, Optional[str]] = {}
+        self._ids_by_issue: Dict[str, Set[str]] = {}
+        self._indexed_file: Optional[Tuple[int, int]] = None
+        self._indexed_offset = 0
+
+    @contextmanager
+    def _locked(self, path: str):
+        """Holds an exclusive lock on `path` (across processes) while writing or compacting"""
+        with open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, path: str, records: List[Dict[str, Any]]) -> None:
+        with self._locked(path):
+            with open(path, "a") as jsonl_file:
+                for record in records:
+                    jsonl_file.write(_to_json(record) + "\n")
+            self._writes[path] += len(records)
+            should_compact = self._writes[path] >= self.compact_every
+        # compact() takes the locks itself, and flock isn't reentrant
+        if should_compact:
+            self.compact()
+
+    def _read(self, path: str) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(path):
+            return
+        with open(path) as jsonl_file:
+            for line in jsonl_file:
+                # Skip blank lines, and a last line that is still being written
+                if line.strip() and line.endswith("\n"):
+                    yield _from_json(line)
+
+    def _link_issue(self, feedback_id: str, html_url: Optional[str]) -> None:
+        old_url = self._issue_by_id.get(feedback_id)
+        if old_url:
+            self._ids_by_issue.get(old_url, set()).discard(feedback_id)
+        self._issue_by_id[feedback_id] = html_url
+        if html_url:
+            self._ids_by_issue.setdefault(html_url, set()).add(feedback_id)
+
+    def _refresh_index(self) -> None:
+        """Brings the id and issue URL index up to date with the feedback file"""
+        try:
+            stat = os.stat(self.feedback_path)
+        except FileNotFoundError:
+            return
+        # A compaction (here or in another process) replaces the file
+        if (stat.st_dev, stat.st_ino) != self._indexed_file or (
+            stat.st_size < self._indexed_offset
+        ):
+            self._issue_by_id = {}
+            self._ids_by_issue = {}
+            self._indexed_file = (stat.st_dev, stat.st_ino)
+            self._indexed_offset = 0
+        with open(self.feedback_path, "rb") as jsonl_file:
+            jsonl_file.seek(self._indexed_offset)
+            for line in jsonl_file:
+                # Leave a last line that is still being written for next time
+                if not line.endswith(b"\n"):
+                    break
+                self._indexed_offset += len(line)
+                if not line.strip():
+                    continue
+                record = _from_json(line)
+                if record["type"] == "feedback":
+                    self._link_issue(record["id"], record.get("html_url"))
+                elif record["type"] == "update" and record["id"] in self._issue_by_id:
+                    if "html_url" in record["values"]:
+                        self._link_issue(record["id"], record["values"]["html_url"])
+
+    def _feedback_rows(self) -> Dict[str, Dict[str, Any]]:
+        rows: Dict[str, Dict[str, Any]] = {}
+        for record in self._read(self.feedback_path):
+            record_type = record.pop("type")
+            if record_type == "feedback":
+                rows[record["id"]] = record
+            elif record_type == "update" and record["id"] in rows:
+                rows[record["id"]].update(record["values"])
+        return rows
+
+    def _reaction_totals(
+        self,
+    ) -> Dict[Tuple[Optional[str], Optional[str]], List[int]]:
+        totals: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+        for record in self._read(self.reactions_path):
+            total = totals.setdefault((record["interview"], record["version"]), [0, 0])
+            if record["type"] == "reaction":
+                total[0] += 1
+                total[1] += record["reaction"]
+            elif record["type"] == "reaction_totals":
+                total[0] += record["count"]
+                total[1] += record["sum"]
+        return totals
+
+    def _rewrite(self, path: str, records: Iterable[Dict[str, Any]]) -> None:
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as jsonl_file:
+            for record in records:
+                jsonl_file.write(_to_json(record) + "\n")
+        os.replace(temp_path, path)
+
+    def compact(self) -> None:
+        """Rewrites both files with one line per feedback row and per (interview, version)"""
+        with self._locked(self.feedback_path):
+            self._rewrite(
+                self.feedback_path,
+                ({"type": "feedback", **row} for row in self._feedback_rows().values()),
+            )
+            self._indexed_file = None
+        with self._locked(self.reactions_path):
+            self._rewrite(
+                self.reactions_path,
+                (
+                    {
+                        "type": "reaction_totals",
+                        "interview": interview,
+                        "version": version,
+                        "count": count,
+                        "sum": total,
+                    }
+                    for (interview, version), (
+                        count,
+                        total,
+                    ) in self._reaction_totals().items()
+                ),
+            )
+        self._writes = {path: 0 for path in self._writes}
+
+    def save_feedback(self, values: Dict[str, Any]) -> Optional[str]:
+        feedback_id = uuid.uuid4().hex
+        self._append(
+            self.feedback_path, [{"type": "feedback", **values, "id": feedback_id}]
+        )
+        return feedback_id
+
+    def update_feedback(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        self._refresh_index()
+        found = [
+            feedback_id for feedback_id in updates if feedback_id in self._issue_by_id
+        ]
+        if found:
+            self._append(
+                self.feedback_path,
+                [
+                    {
+                        "type": "update",
+                        "id": feedback_id,
+                        "values": updates[feedback_id],
+                    }
+                    for feedback_id in found
+                ],
+            )
+        return len(found)
+
+    def update_feedback_by_issue(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        self._refresh_index()
+        by_id = {
+            feedback_id: values
+            for html_url, values in updates.items()
+            for feedback_id in self._ids_by_issue.get(html_url, ())
+        }
+        return self.update_feedback(by_id) if by_id else 0
+
+    def get_all_feedback_info(
+        self, interview: Optional[str] = None, include_archived=False
+    ) -> Dict[str, Dict[str, Any]]:
+        return {
+            feedback_id: row
+            for feedback_id, row in self._feedback_rows().items()
+            if _include_feedback(row, interview, include_archived)
+        }
+
+    def save_good_or_bad(
+        self, reaction: int, interview: Optional[str], version: Optional[str]
+    ) -> None:
+        self._append(
+            self.reactions_path,
+            [
+                {
+                    "type": "reaction",
+                    "reaction": reaction,
+                    "interview": interview,
+                    "version": version,
+                    "datetime": datetime.now(),
+                }
+            ],
+        )
+
+    def get_good_or_bad(self, interview: Optional[str] = None) -> List[Dict[str, Any]]:
+        return _reaction_rows(self._reaction_totals(), interview)
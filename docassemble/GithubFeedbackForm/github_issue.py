@@ -1,9 +1,17 @@
+import asyncio
 import importlib
 import json
+import os
 import requests
-from typing import Dict, Optional, List, Union, Any
+import threading
+import time
+import yaml
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, List, NamedTuple, Tuple, Union, Any
 from urllib.parse import urlencode, quote_plus
-from docassemble.base.util import log, get_config, interview_url
+from docassemble.base.util import DARedis, log, get_config, interview_url
+from docassemble.base.functions import this_thread
 import re
 
 try:
@@ -11,6 +19,8 @@ try:
 except ImportError:
     pass
 
+import httpx
+
 # reference: https://gist.github.com/JeffPaine/3145490
 # https://docs.github.com/en/free-pro-team@latest/rest/reference/issues#create-an-issue
 
@@ -19,9 +29,19 @@ except ImportError:
 __all__ = [
     "valid_github_issue_config",
     "make_github_issue",
+    "make_github_issue_async",
+    "make_github_issues",
+    "make_github_issues_async",
     "feedback_link",
+    "RepositoryRoute",
+    "get_repository_route",
+    "get_repository_label",
+    "get_feedback_repository",
+    "validate_repository_routes",
     "is_likely_spam",
+    "is_likely_spam_async",
     "is_likely_spam_from_genai",
+    "is_likely_spam_from_genai_async",
     "prefill_github_issue_url",
 ]
 USERNAME = get_config("github issues", {}).get("username")
@@ -31,15 +51,369 @@ def _get_token() -> Optional[str]:
     return (get_config("github issues") or {}).get("token")
 
 
-def _get_allowed_repo_owners() -> List[str]:
-    github_config = get_config("github issues") or {}
+def _get_allowed_repo_owners() -> FrozenSet[str]:
+    """The lowercased owners that issues can be made on, from `allowed repository owners`.
+    Rebuilt only when the config changes."""
+    return _routing_table().allowed_owners
+
+
+def _default_repo_owner() -> str:
+    return (get_config("github issues") or {}).get(
+        "default repository owner"
+    ) or "suffolklitlab"
+
+
+def _compute_allowed_repo_owners(github_config: Dict[str, Any]) -> FrozenSet[str]:
     repo_owners = github_config.get("allowed repository owners")
     if not repo_owners:
         default_owner = github_config.get("default reporitory owner")
         repo_owners = [default_owner] if default_owner else []
     if not repo_owners:
         repo_owners = ["suffolklitlab", "suffolklitlab-issues"]
-    return [owner.lower() for owner in repo_owners]
+    return frozenset(owner.lower() for owner in repo_owners)
+
+
+###################################
+## Routing table: which repository (and label) feedback on each package or
+## interview goes to. Configured like this:
+##
+## github issues:
+##   repository routes:
+##     docassemble.AssemblyLine:                     # every interview in a package
+##       owner: suffolklitlab                        # defaults to `default repository owner`
+##       repository: docassemble-AssemblyLine
+##       label: user feedback                        # optional
+##     docassemble.MassAccess:housing_code.yml:      # one interview
+##       repository: docassemble-HousingCodeChecklist
+##   repository routes file: /usr/share/docassemble/files/routes.yml  # optional, same format
+##
+## The table is compiled into dicts once, and recompiled when the config
+## or the routes file changes. The routes file is checked for changes at most
+## once every ROUTES_FILE_CHECK_SECONDS.
+
+redis_validated_repos_key = "docassemble-GithubFeedbackForm:validated_repos"
+redis_validation_lock_key = "docassemble-GithubFeedbackForm:validated_repos:lock"
+REPO_VALIDATION_SECONDS = 24 * 60 * 60
+VALIDATED_REPOS_REFRESH_SECONDS = 5 * 60
+ROUTES_FILE_CHECK_SECONDS = 30
+
+
+class RepositoryRoute(NamedTuple):
+    owner: str
+    repo: str
+    label: Optional[str] = None
+
+
+class _RoutingTable(NamedTuple):
+    routes: Dict[str, RepositoryRoute]
+    labels: Dict[Tuple[str, str], str]
+    allowed_owners: FrozenSet[str]
+
+
+_routing_cache: Dict[str, Any] = {"source": None, "table": None, "checked": 0.0}
+_routing_lock = threading.Lock()
+
+
+def _route_key(name: str) -> str:
+    """Normalizes a package or interview name, so that `docassemble.X:data/questions/y.yml`
+    and `docassemble.X:y.yml` are the same route"""
+    return name.strip().lower().replace(":data/questions/", ":")
+
+
+def _load_routes_file(path: Optional[str]) -> Dict[str, Any]:
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as routes_file:
+            return yaml.safe_load(routes_file) or {}
+    except Exception as ex:
+        log(f"github_issue: unable to read repository routes from {path}: {ex}")
+        return {}
+
+
+def _compile_routes(
+    github_config: Dict[str, Any], file_routes: Dict[str, Any]
+) -> _RoutingTable:
+    default_owner = github_config.get("default repository owner") or "suffolklitlab"
+    allowed_owners = _compute_allowed_repo_owners(github_config)
+    routes: Dict[str, RepositoryRoute] = {}
+    labels: Dict[Tuple[str, str], str] = {}
+    # Routes in the config win over routes in the file
+    raw_routes = {**file_routes, **(github_config.get("repository routes") or {})}
+    for name, target in raw_routes.items():
+        if not isinstance(target, dict) or not target.get("repository"):
+            log(f"github_issue: ignoring repository route {name}, it has no repository")
+            continue
+        route = RepositoryRoute(
+            owner=str(target.get("owner") or default_owner),
+            repo=str(target["repository"]),
+            label=target.get("label"),
+        )
+        # Routes can't widen who gets issues; that's only up to `allowed repository owners`
+        if route.owner.lower() not in allowed_owners:
+            log(
+                f"github_issue: ignoring repository route {name}, {route.owner} is not "
+                "in `allowed repository owners`"
+            )
+            continue
+        routes[_route_key(name)] = route
+        if route.label:
+            labels.setdefault((route.owner.lower(), route.repo.lower()), route.label)
+    return _RoutingTable(routes, labels, allowed_owners)
+
+
+def _routing_table() -> _RoutingTable:
+    github_config = get_config("github issues") or {}
+    routes_path = github_config.get("repository routes file")
+    # docassemble hands back the same dict until the config is reloaded, so
+    # comparing identities is enough to notice a change
+    config_source = (id(github_config), routes_path)
+    table = _routing_cache["table"]
+    cached_source = _routing_cache["source"]
+    now = time.monotonic()
+    if (
+        table is not None
+        and cached_source[:2] == config_source
+        and now - _routing_cache["checked"] < ROUTES_FILE_CHECK_SECONDS
+    ):
+        return table
+    try:
+        routes_mtime = os.stat(routes_path).st_mtime if routes_path else None
+    except OSError:
+        routes_mtime = None
+    source = (*config_source, routes_mtime)
+    with _routing_lock:
+        if _routing_cache["table"] is None or _routing_cache["source"] != source:
+            _routing_cache["table"] = _compile_routes(
+                github_config, _load_routes_file(routes_path)
+            )
+            _routing_cache["source"] = source
+        _routing_cache["checked"] = now
+        return _routing_cache["table"]
+
+
+def get_repository_route(
+    filename: Optional[str] = None, package: Optional[str] = None
+) -> Optional[RepositoryRoute]:
+    """
+    Looks up where feedback on an interview should go in the `repository routes` table.
+
+    Args:
+        filename: the interview, like docassemble.AssemblyLine:data/questions/intro.yml
+        package: the interview's package, like docassemble.AssemblyLine. Taken from
+            `filename` if not given.
+
+    Returns:
+        the route for the interview if there is one, otherwise the route for its package,
+        or None if neither is in the table
+    """
+    routes = _routing_table().routes
+    if not routes:
+        return None
+    if filename:
+        route = routes.get(_route_key(filename))
+        if route:
+            return route
+        if not package and ":" in filename:
+            package = filename.split(":", 1)[0]
+    if package:
+        return routes.get(_route_key(package))
+    return None
+
+
+def get_repository_label(repo_owner: str, repo_name: str) -> Optional[str]:
+    """The label that the routing table gives to issues on a repository, if any"""
+    return _routing_table().labels.get((repo_owner.lower(), repo_name.lower()))
+
+
+def get_feedback_repository(
+    filename: Optional[str],
+    repo_owner: Optional[str] = None,
+    repo_name: Optional[str] = None,
+) -> Optional[RepositoryRoute]:
+    """
+    Where the issue for saved feedback should go: the repository saved with the
+    feedback if there is one, otherwise the route for its interview, otherwise the
+    default repository owner's repository named after the interview's package (like
+    docassemble-AssemblyLine for docassemble.AssemblyLine:data/questions/intro.yml).
+
+    Args:
+        filename: the interview the feedback is on
+        repo_owner: the `github_user` saved with the feedback, if any
+        repo_name: the `github_repo_name` saved with the feedback, if any
+
+    Returns:
+        the repository, with the label the routing table gives it, or None if there
+        is no saved repository, no route and no interview
+    """
+    if not repo_name:
+        route = get_repository_route(filename)
+        if route:
+            return route
+        package = (filename or "").split(":", 1)[0]
+        if not package:
+            return None
+        repo_owner, repo_name = None, package.replace(".", "-")
+    repo_owner = repo_owner or _default_repo_owner()
+    return RepositoryRoute(
+        repo_owner, repo_name, get_repository_label(repo_owner, repo_name)
+    )
+
+
+_validated_repos_cache: Dict[str, Any] = {"loaded": 0.0, "repos": frozenset()}
+
+
+def _decode(value: Union[str, bytes]) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _validated_repositories() -> FrozenSet[str]:
+    """The "owner/repo" names (lowercased) that we recently checked we can make issues on.
+
+    Shared across processes in Redis and kept in memory for a few minutes. The routes
+    are checked when the server starts; see `_start_route_validation`.
+    """
+    now = time.monotonic()
+    if now - _validated_repos_cache["loaded"] < VALIDATED_REPOS_REFRESH_SECONDS:
+        return _validated_repos_cache["repos"]
+    _validated_repos_cache["loaded"] = now
+    try:
+        checked = _recent_repo_validations(DARedis())
+    except Exception as ex:
+        log(f"github_issue: unable to load validated repositories: {ex}")
+        return _validated_repos_cache["repos"]
+    _validated_repos_cache["repos"] = frozenset(
+        repo for repo, ok in checked.items() if ok
+    )
+    return _validated_repos_cache["repos"]
+
+
+def _recent_repo_validations(red) -> Dict[str, bool]:
+    """The repositories checked in the last REPO_VALIDATION_SECONDS, and whether issues
+    can be made on each. Every repository is saved with the time it was checked, as
+    "1:<timestamp>" or "0:<timestamp>", so each one expires on its own."""
+    cutoff = time.time() - REPO_VALIDATION_SECONDS
+    results: Dict[str, bool] = {}
+    for repo, value in red.hgetall(redis_validated_repos_key).items():
+        ok, _, checked_at = _decode(value).partition(":")
+        try:
+            if float(checked_at) >= cutoff:
+                results[_decode(repo)] = ok == "1"
+        except ValueError:
+            pass  # no time, so treat it as not checked
+    return results
+
+
+def _start_route_validation() -> None:
+    """Checks the routing table's repositories in a background thread. Called once as
+    each server process starts, from the pre-loaded `github_webhook` module."""
+    threading.Thread(target=_validate_routes_at_startup, daemon=True).start()
+
+
+def _validate_routes_at_startup() -> None:
+    """Checks the routes that no process has checked recently, from one process only.
+
+    Repositories that aren't checked here (e.g. routes added to the routes file later)
+    are checked before their first issue.
+    """
+    try:
+        if not valid_github_issue_config():
+            return
+        red = DARedis()
+        checked = _recent_repo_validations(red)
+        unchecked = sorted(
+            {
+                (route.owner, route.repo)
+                for route in _routing_table().routes.values()
+                if f"{route.owner}/{route.repo}".lower() not in checked
+            }
+        )
+        if not unchecked or not red.set(
+            redis_validation_lock_key, 1, nx=True, ex=VALIDATED_REPOS_REFRESH_SECONDS
+        ):
+            return  # nothing to check, or another process is already checking
+        asyncio.run(_validate_repositories_async(unchecked))
+    except Exception as ex:
+        log(f"github_issue: unable to validate repository routes: {ex}")
+
+
+def _record_repo_validation(results: Dict[str, bool]) -> None:
+    if not results:
+        return
+    try:
+        checked_at = time.time()
+        pipe = DARedis().pipeline()
+        pipe.hset(
+            redis_validated_repos_key,
+            mapping={
+                repo: f"{1 if ok else 0}:{checked_at}" for repo, ok in results.items()
+            },
+        )
+        # Only cleans up once nothing is checked for a while; each repository's
+        # own time is what makes it expire
+        pipe.expire(redis_validated_repos_key, REPO_VALIDATION_SECONDS)
+        pipe.execute()
+    except Exception as ex:
+        log(f"github_issue: unable to save validated repositories: {ex}")
+    # Make this process's cache reload on its next use
+    _validated_repos_cache["loaded"] = 0.0
+
+
+async def _validate_repositories_async(
+    repos: List[Tuple[str, str]], max_concurrency: int = 8
+) -> Dict[str, bool]:
+    headers = _github_headers()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def check(client, repo_owner: str, repo_name: str) -> bool:
+        async with semaphore:
+            return await _repo_is_accessible_async(
+                client, repo_owner, repo_name, headers
+            )
+
+    async with _async_client() as client:
+        accessible = await asyncio.gather(
+            *[check(client, repo_owner, repo_name) for repo_owner, repo_name in repos]
+        )
+    results = {
+        f"{repo_owner}/{repo_name}".lower(): ok
+        for (repo_owner, repo_name), ok in zip(repos, accessible)
+    }
+    _record_repo_validation(results)
+    return results
+
+
+def validate_repository_routes(max_concurrency: int = 8) -> Dict[str, bool]:
+    """
+    Checks that every repository in the routing table can be reached with the configured
+    token, all at once. The results are shared by every server process for a day, and
+    repositories that passed aren't checked again before each new issue.
+
+    Returns:
+        a dict of "owner/repo" (lowercased) to whether issues can be made on it
+    """
+    repos = sorted(
+        {(route.owner, route.repo) for route in _routing_table().routes.values()}
+    )
+    if not repos or not valid_github_issue_config():
+        return {}
+    return asyncio.run(_validate_repositories_async(repos, max_concurrency))
+
+
+def _repo_was_validated(repo_owner: str, repo_name: str) -> bool:
+    return f"{repo_owner}/{repo_name}".lower() in _validated_repositories()
+
+
+def _forget_repo_validation(repo_owner: str, repo_name: str) -> None:
+    """Called when an issue couldn't be made on a repository we thought was fine"""
+    _record_repo_validation({f"{repo_owner}/{repo_name}".lower(): False})
+
+
+def _api_url() -> str:
+    """The GitHub API to use. Can be changed for GitHub Enterprise, or a fake server for testing"""
+    return (
+        (get_config("github issues") or {}).get("api url") or "https://api.github.com"
+    ).rstrip("/")
 
 
 def valid_github_issue_config():
@@ -66,18 +440,21 @@ def feedback_link(
 
     To determine the feedback destination repository's name, e.g., docassemble-AssemblyLine:
 
-    1. It tries using the output of current_context() (formerly user_info()), if passed as the user_info_object parameter,
-       to retrieve the package's name. It also tries to get the variable, question_id,
-       filename, and session ID from the user_info_object. Note if you want to test the feedback from during development, the package name is not available
-       when running from the playground.
-    2. It uses the value of the github_repo parameter.
+    1. It uses the value of the github_repo parameter.
+    2. It looks up the interview's filename, then its package, in the routing table at
+       github issues: repository routes in the Docassemble config (see `get_repository_route`).
+       The filename and package come from the output of current_context() (formerly user_info()),
+       if passed as the user_info_object parameter, which is also used to get the variable,
+       question_id and session ID. Note if you want to test the feedback from during development,
+       the package name is not available when running from the playground.
     3. It defaults to the demo repository on the suffolklitlab-issues organization.
 
     To determine the feedback destination repository's owner, e.g., suffolklitlab:
 
     1. It uses the value of the github_user parameter.
     2. It tries to get the default repository owner from the Docassemble config, at github issues: default repository owner.
-    3. It defaults to suffolklitlab-issues.
+    3. It uses the owner from the routing table, if the repository came from there.
+    4. It defaults to suffolklitlab-issues.
 
     The variable, question_id, package_version, and filename parameters can also be passed in manually rather than retrieved from the
     user_info_object parameter.
@@ -104,73 +481,173 @@ def feedback_link(
 
         feedback_link(current_context(), github_repo="docassemble-AssemblyLine", github_user="suffolklitlab", variable="my_variable", question_id="my_question", package_version="1.0.0", filename="my_file.py", i="docassemble.GithubFeedbackForm:feedback.yml")
     """
+    _variable = _question_id = _filename = _package_version = _session_id = None
+    _package = None
     if user_info_object:
-        package_name = str(user_info_object.package)
-        # TODO: maybe we can use the packages table or /api/packages to get the exact GitHub URL, which would include the owner
-        if package_name and not package_name.startswith("docassemble-playground"):
-            _github_repo = package_name.replace(".", "-")
-        else:
-            _github_repo = "demo"  # default repo on GitHub of suffolklitlab-issues/demo for documentation purposes
         _variable = user_info_object.variable
         _question_id = user_info_object.question_id
         _filename = user_info_object.filename
-        try:
-            _package_version = str(
-                importlib.import_module(user_info_object.package).__version__
-            )
-        except:
-            _package_version = "playground"
-        if get_config("github issues", {}).get("default repository owner"):
-            _github_user = get_config("github issues", {}).get(
-                "default repository owner"
-            )
+        _package = user_info_object.package
+        _package_version = _get_package_version(_package)
         _session_id = user_info_object.session
-    else:
-        _session_id = None
 
     # Allow keyword params to override any info from the current_context() object
+    if variable:
+        _variable = variable
+    if question_id:
+        _question_id = question_id
+    if package_version:
+        _package_version = package_version
+    if filename:
+        _filename = filename
+
     # We will try pulling the repo owner name from the Docassemble config
+    default_owner = (get_config("github issues") or {}).get("default repository owner")
+    route = None if github_repo else get_repository_route(_filename, _package)
     if github_repo and github_user:
         _github_repo = github_repo
         _github_user = github_user
-    elif (
-        get_config("github issues", {}).get("default repository owner") and github_repo
-    ):
-        _github_user = get_config("github issues", {}).get("default repository owner")
+    elif default_owner and github_repo:
+        _github_user = default_owner
         _github_repo = github_repo
+    elif route:
+        _github_user = route.owner
+        _github_repo = route.repo
     else:
         _github_repo = "demo"
         _github_user = "suffolklitlab-issues"
         log(
             "No github_repo provided, using default demo repository to get the feedback"
         )
-    if variable:
-        _variable = variable
-    if question_id:
-        _question_id = question_id
-    if package_version:
-        _package_version = package_version
-    if filename:
-        _filename = filename
 
     if not i:
         i = "docassemble.GithubFeedbackForm:feedback.yml"
         log("No feedback interview file provided, using default feedback interview")
 
+    # Only the variable, question and session change from screen to screen
+    per_screen_params = {
+        key: value
+        for key, value in [
+            ("variable", _variable),
+            ("question_id", _question_id),
+            ("session_id", _session_id),
+        ]
+        if value is not None
+    }
+    # interview_url() resolves a relative `i` against the current package, and
+    # uses the current request's host, so both have to be part of the cache key
+    qualified_i = _qualified_interview(i, _package or _current_package())
+    if qualified_i:
+        base_url = _feedback_link_base(
+            qualified_i,
+            _github_repo,
+            _github_user,
+            _package_version,
+            _filename,
+            _current_url_root(),
+        )
+    else:
+        base_url = _feedback_link_url(
+            i, _github_repo, _github_user, _package_version, _filename
+        )
+    if not per_screen_params:
+        return base_url
+    separator = "&" if "?" in base_url else "?"
+    return base_url + separator + urlencode(per_screen_params)
+
+
+@lru_cache(maxsize=128)
+def _get_package_version(package: Optional[str]) -> str:
+    """The installed version of `package`. Cached for the life of the process, so
+    a new version installed without restarting the server isn't picked up."""
+    try:
+        return str(importlib.import_module(str(package)).__version__)
+    except:
+        return "playground"
+
+
+def _current_package() -> Optional[str]:
+    return getattr(this_thread, "current_package", None)
+
+
+def _current_url_root() -> Optional[str]:
+    current_info = getattr(this_thread, "current_info", None) or {}
+    return current_info.get("url_root")
+
+
+def _qualified_interview(i: str, package: Optional[str]) -> Optional[str]:
+    """`i` with its package, the way `interview_url` would resolve it, or None
+    if it's relative and we don't know the package"""
+    if i.startswith("docassemble."):
+        return i
+    if not package:
+        return None
+    return f"{package}:data/questions/{re.sub(r'^data/questions/', '', i)}"
+
+
+@lru_cache(maxsize=256)
+def _feedback_link_base(
+    i: str,
+    github_repo: str,
+    github_user: str,
+    package_version: Optional[str],
+    filename: Optional[str],
+    url_root: Optional[str],
+) -> str:
+    """The part of a `feedback_link` that is the same on every screen of an interview.
+
+    `i` must already include its package. `url_root` isn't used to build the URL;
+    it keeps links made for one host from being reused for another.
+    """
+    return _feedback_link_url(i, github_repo, github_user, package_version, filename)
+
+
+def _feedback_link_url(
+    i: str,
+    github_repo: str,
+    github_user: str,
+    package_version: Optional[str],
+    filename: Optional[str],
+) -> str:
     return interview_url(
         i=i,
-        github_repo=_github_repo,
-        github_user=_github_user,
-        variable=_variable,
-        question_id=_question_id,
-        package_version=_package_version,
-        filename=_filename,
-        session_id=_session_id,
+        github_repo=github_repo,
+        github_user=github_user,
+        package_version=package_version,
+        filename=filename,
         local=False,
         reset=1,
     )
 
 
+def _spam_model_and_key(
+    model: Optional[str], gemini_api_key: Optional[str]
+) -> Tuple[str, Optional[str]]:
+    model = model or get_config("github issues", {}).get(
+        "spam model", "gemini-2.0-flash-exp"
+    )
+    gemini_api_key = gemini_api_key or get_config("google gemini api key")
+    return model, gemini_api_key
+
+
+def _genai_spam_model(context: Optional[str], model: str, gemini_api_key: str):
+    if context is None:  # empty string is a valid input
+        context = "a guided interview in the legal context"
+
+    genai.configure(api_key=gemini_api_key)
+    return genai.GenerativeModel(
+        model_name=model,
+        system_instruction=f"""
+            You are reviewing a feedback form for {context}. Your job is to allow as many
+            relevant feedback responses as possible while filtering out irrelevant and spam feedback,
+            especially targeted advertising that isn't pointing out a problem on the guided interview.
+
+            Rate the user's feedback as 'spam' or 'not spam' based on the context of the guided interview.
+            Answer only with the exact keywords: 'spam' or 'not spam'.
+            """,
+    )
+
+
 def is_likely_spam_from_genai(
     body: Optional[str],
     context: Optional[str] = None,
@@ -190,33 +667,50 @@ def is_likely_spam_from_genai(
     if not body:
         return False
 
-    model = model or get_config("github issues", {}).get(
-        "spam model", "gemini-2.0-flash-exp"
-    )
-    gemini_api_key = gemini_api_key or get_config("google gemini api key")
+    model, gemini_api_key = _spam_model_and_key(model, gemini_api_key)
 
     if not gemini_api_key:  # not passed as a parameter OR in the global config
         log("Not using Google Gemini Flash to check for spam: no API key provided")
         return False
 
-    if context is None:  # empty string is a valid input
-        context = "a guided interview in the legal context"
-
     try:
-        genai.configure(api_key=gemini_api_key)
-        model = genai.GenerativeModel(
-            model_name=model,
-            system_instruction=f"""
-                You are reviewing a feedback form for {context}. Your job is to allow as many
-                relevant feedback responses as possible while filtering out irrelevant and spam feedback,
-                especially targeted advertising that isn't pointing out a problem on the guided interview.
-
-                Rate the user's feedback as 'spam' or 'not spam' based on the context of the guided interview.
-                Answer only with the exact keywords: 'spam' or 'not spam'.
-                """,
+        response = _genai_spam_model(context, model, gemini_api_key).generate_content(
+            body
+        )
+        if response.text.strip() == "spam":
+            return True
+    except NameError:
+        log(
+            f"Error using Google Gemini Flash: the `google.generativeai` module is not available"
         )
+    except Exception as e:
+        log(f"Error using Google Gemini Flash: {e}")
+        return False
+    return False
+
 
-        response = model.generate_content(body)
+async def is_likely_spam_from_genai_async(
+    body: Optional[str],
+    context: Optional[str] = None,
+    gemini_api_key: Optional[str] = None,
+    model="gemini-2.0-flash-exp",
+) -> bool:
+    """
+    Async version of `is_likely_spam_from_genai`. Takes the same arguments.
+    """
+    if not body:
+        return False
+
+    model, gemini_api_key = _spam_model_and_key(model, gemini_api_key)
+
+    if not gemini_api_key:  # not passed as a parameter OR in the global config
+        log("Not using Google Gemini Flash to check for spam: no API key provided")
+        return False
+
+    try:
+        response = await _genai_spam_model(
+            context, model, gemini_api_key
+        ).generate_content_async(body)
         if response.text.strip() == "spam":
             return True
     except NameError:
@@ -229,6 +723,72 @@ def is_likely_spam_from_genai(
     return False
 
 
+_SPAM_URLS = ["leadgeneration.com", "leadmagnet.com"]
+_SPAM_KEYWORDS = [
+    "100 times more effective",
+    "adult dating",
+    "backlink",
+    "backlinks",
+    "binary options",
+    "bitcoin investment",
+    "cheap hosting",
+    "cheap meds",
+    "cialis",
+    "credit repair fast",
+    "earn money online",
+    "email me",
+    "escort service",
+    "forex trading",
+    "free gift cards",
+    "free trial",
+    "get rich quick",
+    "increase website traffic",
+    "international long distance calling",
+    "keep this info confidential",
+    "lead feature",
+    "lead generation",
+    "lottery winner",
+    "market your business",
+    "nigerian prince",
+    "online casino",
+    "payment/deposit handler",
+    "reliable business representative",
+    "remote job opportunity",
+    "results are astounding",
+    "send an email",
+    "seo services",
+    "split the funds",
+    "turkish bank",
+    "unsubscribe",
+    "viagra",
+    "visit this link",
+    "web lead",
+    "web visitors",
+    "work from home",
+    "your late relative",
+]
+_URL_REGEX = re.compile(r"(https?:\/\/[^\s]+)", flags=re.IGNORECASE)
+
+
+def _is_likely_spam_from_keywords(
+    body: str, keywords: Optional[List[str]], filter_urls: bool
+) -> bool:
+    """The local (no network) part of `is_likely_spam`. Expects a lowercased body."""
+    all_keywords = (
+        list(keywords or [])
+        + _SPAM_KEYWORDS
+        + _SPAM_URLS
+        + get_config("github issues", {}).get("spam keywords", [])
+    )
+    if any([keyword in body for keyword in all_keywords]):
+        return True
+
+    if filter_urls and re.search(_URL_REGEX, body):
+        return True
+
+    return False
+
+
 def is_likely_spam(
     body: Optional[str],
     keywords: Optional[List[str]] = None,
@@ -246,70 +806,34 @@ def is_likely_spam(
         keywords (Optional[List[str]]): a list of additional keywords that are likely spam, defaults to a set of keywords
             from the global configuration under the `github issues: spam keywords` key
     """
+    if not body:
+        return False
+    body = body.lower()
+    if _is_likely_spam_from_keywords(body, keywords, filter_urls):
+        return True
+
+    return is_likely_spam_from_genai(body, model=model)
+
 
-    _urls = ["leadgeneration.com", "leadmagnet.com"]
-    _keywords = [
-        "100 times more effective",
-        "adult dating",
-        "backlink",
-        "backlinks",
-        "binary options",
-        "bitcoin investment",
-        "cheap hosting",
-        "cheap meds",
-        "cialis",
-        "credit repair fast",
-        "earn money online",
-        "email me",
-        "escort service",
-        "forex trading",
-        "free gift cards",
-        "free trial",
-        "get rich quick",
-        "increase website traffic",
-        "international long distance calling",
-        "keep this info confidential",
-        "lead feature",
-        "lead generation",
-        "lottery winner",
-        "market your business",
-        "nigerian prince",
-        "online casino",
-        "payment/deposit handler",
-        "reliable business representative",
-        "remote job opportunity",
-        "results are astounding",
-        "send an email",
-        "seo services",
-        "split the funds",
-        "turkish bank",
-        "unsubscribe",
-        "viagra",
-        "visit this link",
-        "web lead",
-        "web visitors",
-        "work from home",
-        "your late relative",
-    ]
-
-    if not keywords:
-        keywords = []
-    keywords += _keywords + _urls
-
-    keywords += get_config("github issues", {}).get("spam keywords", [])
+async def is_likely_spam_async(
+    body: Optional[str],
+    keywords: Optional[List[str]] = None,
+    filter_urls: bool = True,
+    model: Optional[str] = None,
+) -> bool:
+    """
+    Async version of `is_likely_spam`. Takes the same arguments.
 
+    Like `is_likely_spam`, the LLM is only asked when the keyword and URL checks
+    don't already flag the body as spam.
+    """
     if not body:
         return False
     body = body.lower()
-    if any([keyword in body for keyword in keywords]):
+    if _is_likely_spam_from_keywords(body, keywords, filter_urls):
         return True
 
-    if filter_urls:
-        url_regex = re.compile(r"(https?:\/\/[^\s]+)", flags=re.IGNORECASE)
-        if re.search(url_regex, body):
-            return True
-
-    return is_likely_spam_from_genai(body, model=model)
+    return await is_likely_spam_from_genai_async(body, model=model)
 
 
 def prefill_github_issue_url(
@@ -328,10 +852,7 @@ def prefill_github_issue_url(
     body - the body of the github issue
     """
     if not repo_owner:
-        repo_owner = (
-            get_config("github issues", {}).get("default repository owner")
-            or "suffolklitlab"
-        )
+        repo_owner = _default_repo_owner()
     if not repo_name:
         repo_name = (
             get_config("github issues", {}).get("default repository name")
@@ -348,110 +869,79 @@ def prefill_github_issue_url(
     return f"https://github.com/{repo_owner}/{repo_name}/issues/new?{url_params}"
 
 
-def make_github_issue(
-    repo_owner: str,
-    repo_name: str,
-    template=None,
-    title: Optional[str] = None,
-    body: Optional[str] = None,
-    label: Optional[str] = None,
-) -> Optional[str]:
-    """
-    Create a new GitHub issue and return the URL.
-
-    Args:
-        template: a docassemble template that overrides `title` and `body`
-        title: the title for the GitHub issue
-        body: the body of the GitHub issue
-        label: optional label to add *if* we can verify or create it
-
-    At least one of template, title, and body is required.
+def _github_headers() -> Dict[str, str]:
+    return {
+        "Authorization": f"token {_get_token()}",
+        "Accept": "application/vnd.github.v3+json",
+    }
 
-    Returns:
-        str, the URL for the label if it exists, or None if the issue could not be created
-    """
-    make_issue_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues"
 
-    # Abort early if the configuration or repo owner is invalid
+def _can_make_issue(repo_owner: str) -> bool:
+    """Checks the token and the allowed repository owners, logging why not if we can't."""
     if not valid_github_issue_config():
         log(
             "Error creating issue: No valid GitHub token provided. "
             "See https://github.com/SuffolkLITLab/docassemble-GithubFeedbackForm#getting-started"
         )
-        return None
+        return False
     if repo_owner.lower() not in _get_allowed_repo_owners():
         log(
             f"Error creating issue: repositories owned by {repo_owner} are not permitted. "
             "See https://github.com/SuffolkLITLab/docassemble-GithubFeedbackForm#getting-started"
         )
-        return None
-
-    headers = {
-        "Authorization": f"token {_get_token()}",
-        "Accept": "application/vnd.github.v3+json",
-    }
+        return False
+    return True
 
-    # Abort early for private repos
-    repo_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}"
-    repo_resp = requests.get(repo_url, headers=headers)
 
+def _repo_accessible_from_response(repo_owner: str, repo_name: str, repo_resp) -> bool:
     if repo_resp.status_code != 200:
         log(
             f"Cannot access repo {repo_owner}/{repo_name}: "
             f"{repo_resp.status_code} {repo_resp.text}. Maybe it is a private repo?"
             "Check that the PAT has the correct scopes and that the user can write to the repo."
         )
-        return None
+        return False
+    return True
 
-    # ------------------------------------------------------------------
-    # 1. Figure out whether we can safely apply the label
-    # ------------------------------------------------------------------
-    apply_label = False  # only set to True when we're sure it exists
 
-    if label:
-        make_labels_url = (
-            f"https://api.github.com/repos/{repo_owner}/{repo_name}/labels"
-        )
-        get_labels_url = f"{make_labels_url}/{label}"
-        has_label_resp = requests.get(get_labels_url, headers=headers)
-
-        if has_label_resp.status_code == 200:
-            # Label already exists in the repo
-            apply_label = True
-
-        elif has_label_resp.status_code == 404:
-            # Try to create the label; this may fail if the token lacks permission
-            label_data = {
-                "name": label,
-                "description": "Feedback from a Docassemble Interview",
-                "color": "002E60",
-            }
-            make_label_resp = requests.post(
-                make_labels_url,
-                data=json.dumps(label_data),
-                headers=headers,
-            )
-            if make_label_resp.status_code == 201:
-                log(
-                    f"Created the '{label}' label for the "
-                    f"{repo_owner}/{repo_name} repository"
-                )
-                apply_label = True
-            else:
-                log(
-                    f"Could not create label '{label}': {make_label_resp.status_code} "
-                    f"{make_label_resp.text}"
-                )
-        else:
-            # 403, 422, etc. → most likely a permissions issue; skip using the label
-            log(
-                f"Unable to verify label '{label}': {has_label_resp.status_code} "
-                f"{has_label_resp.text}"
-            )
+def _label_data(label: str) -> Dict[str, str]:
+    return {
+        "name": label,
+        "description": "Feedback from a Docassemble Interview",
+        "color": "002E60",
+    }
+
+
+def _label_created_from_response(
+    repo_owner: str, repo_name: str, label: str, make_label_resp
+) -> bool:
+    if make_label_resp.status_code == 201:
+        log(f"Created the '{label}' label for the {repo_owner}/{repo_name} repository")
+        return True
+    log(
+        f"Could not create label '{label}': {make_label_resp.status_code} "
+        f"{make_label_resp.text}"
+    )
+    return False
+
+
+def _log_unverified_label(label: str, has_label_resp) -> None:
+    # 403, 422, etc. → most likely a permissions issue; skip using the label
+    log(
+        f"Unable to verify label '{label}': {has_label_resp.status_code} "
+        f"{has_label_resp.text}"
+    )
+
 
-    # ------------------------------------------------------------------
-    # 2. Derive title/body from a template, if supplied
-    # ------------------------------------------------------------------
+def _issue_data(
+    template=None,
+    title: Optional[str] = None,
+    body: Optional[str] = None,
+    label: Optional[str] = None,
+    apply_label: bool = False,
+) -> Optional[Dict[str, Union[str, List[str]]]]:
+    """Derives the issue's title and body (from a template, if supplied) and
+    builds the JSON payload. Returns None if there is nothing to post."""
     if template:
         if hasattr(template, "subject"):
             title = template.subject
@@ -467,20 +957,312 @@ def make_github_issue(
     if not title:
         title = "User feedback"
 
-    # ------------------------------------------------------------------
-    # 3. Assemble and POST the issue
-    # ------------------------------------------------------------------
     data: Dict[str, Union[str, List[str]]] = {
         "title": title,
         "body": body,
     }
     if apply_label and label is not None:
         data["labels"] = [label]
+    return data
 
-    response = requests.post(make_issue_url, data=json.dumps(data), headers=headers)
 
+def _issue_url_from_response(data: Dict[str, Any], response) -> Optional[str]:
     if response.status_code == 201:
         return response.json().get("html_url")
+    log(
+        f'Could not create issue "{data["title"]}": {response.status_code} {response.text}'
+    )
+    return None
+
+
+def _repo_is_accessible(repo_owner: str, repo_name: str, headers: Dict) -> bool:
+    repo_url = f"{_api_url()}/repos/{repo_owner}/{repo_name}"
+    repo_resp = requests.get(repo_url, headers=headers)
+    return _repo_accessible_from_response(repo_owner, repo_name, repo_resp)
+
+
+def _ensure_label(
+    repo_owner: str, repo_name: str, label: Optional[str], headers: Dict
+) -> bool:
+    """Returns True only when we're sure the label exists (creating it if needed)."""
+    if not label:
+        return False
+    make_labels_url = f"{_api_url()}/repos/{repo_owner}/{repo_name}/labels"
+    has_label_resp = requests.get(f"{make_labels_url}/{label}", headers=headers)
+
+    if has_label_resp.status_code == 200:
+        # Label already exists in the repo
+        return True
+    if has_label_resp.status_code == 404:
+        # Try to create the label; this may fail if the token lacks permission
+        make_label_resp = requests.post(
+            make_labels_url, data=json.dumps(_label_data(label)), headers=headers
+        )
+        return _label_created_from_response(
+            repo_owner, repo_name, label, make_label_resp
+        )
+    _log_unverified_label(label, has_label_resp)
+    return False
+
+
+def make_github_issue(
+    repo_owner: str,
+    repo_name: str,
+    template=None,
+    title: Optional[str] = None,
+    body: Optional[str] = None,
+    label: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Create a new GitHub issue and return the URL.
+
+    Args:
+        template: a docassemble template that overrides `title` and `body`
+        title: the title for the GitHub issue
+        body: the body of the GitHub issue
+        label: optional label to add *if* we can verify or create it
+
+    At least one of template, title, and body is required.
+
+    Returns:
+        str, the URL for the label if it exists, or None if the issue could not be created
+    """
+    # Abort early if the configuration or repo owner is invalid
+    if not _can_make_issue(repo_owner):
+        return None
+
+    headers = _github_headers()
+
+    # Abort early for private repos, unless we already checked this repo recently
+    validated = _repo_was_validated(repo_owner, repo_name)
+    if not validated:
+        if not _repo_is_accessible(repo_owner, repo_name, headers):
+            return None
+        _record_repo_validation({f"{repo_owner}/{repo_name}".lower(): True})
+
+    apply_label = _ensure_label(repo_owner, repo_name, label, headers)
+
+    data = _issue_data(template, title, body, label, apply_label)
+    if not data:
+        return None
+
+    make_issue_url = f"{_api_url()}/repos/{repo_owner}/{repo_name}/issues"
+    response = requests.post(make_issue_url, data=json.dumps(data), headers=headers)
+    issue_url = _issue_url_from_response(data, response)
+    if not issue_url and validated:
+        _forget_repo_validation(repo_owner, repo_name)
+    return issue_url
+
+
+@asynccontextmanager
+async def _async_client(client=None):
+    """Yields `client` if given, otherwise a new `httpx.AsyncClient` that is closed afterwards."""
+    if client is not None:
+        yield client
     else:
-        log(f'Could not create issue "{title}": {response.status_code} {response.text}')
+        async with httpx.AsyncClient(timeout=30) as new_client:
+            yield new_client
+
+
+async def _repo_is_accessible_async(
+    client, repo_owner: str, repo_name: str, headers: Dict
+) -> bool:
+    repo_url = f"{_api_url()}/repos/{repo_owner}/{repo_name}"
+    repo_resp = await client.get(repo_url, headers=headers)
+    return _repo_accessible_from_response(repo_owner, repo_name, repo_resp)
+
+
+async def _ensure_label_async(
+    client, repo_owner: str, repo_name: str, label: Optional[str], headers: Dict
+) -> bool:
+    if not label:
+        return False
+    make_labels_url = f"{_api_url()}/repos/{repo_owner}/{repo_name}/labels"
+    has_label_resp = await client.get(f"{make_labels_url}/{label}", headers=headers)
+
+    if has_label_resp.status_code == 200:
+        return True
+    if has_label_resp.status_code == 404:
+        make_label_resp = await client.post(
+            make_labels_url, content=json.dumps(_label_data(label)), headers=headers
+        )
+        return _label_created_from_response(
+            repo_owner, repo_name, label, make_label_resp
+        )
+    _log_unverified_label(label, has_label_resp)
+    return False
+
+
+async def make_github_issue_async(
+    repo_owner: str,
+    repo_name: str,
+    template=None,
+    title: Optional[str] = None,
+    body: Optional[str] = None,
+    label: Optional[str] = None,
+    client=None,
+) -> Optional[str]:
+    """
+    Async version of `make_github_issue`. Takes the same arguments, plus an
+    optional `httpx.AsyncClient` to reuse connections across calls.
+
+    The repository check and the label check are made concurrently, so only
+    the issue creation waits on them.
+
+    Returns:
+        str, the URL for the label if it exists, or None if the issue could not be created
+    """
+    if not _can_make_issue(repo_owner):
+        return None
+
+    headers = _github_headers()
+
+    validated = _repo_was_validated(repo_owner, repo_name)
+    try:
+        async with _async_client(client) as client:
+            repo_ok, apply_label = await asyncio.gather(
+                (
+                    _repo_is_accessible_async(client, repo_owner, repo_name, headers)
+                    if not validated
+                    else _already_validated()
+                ),
+                _ensure_label_async(client, repo_owner, repo_name, label, headers),
+            )
+            if not repo_ok:
+                return None
+            if not validated:
+                _record_repo_validation({f"{repo_owner}/{repo_name}".lower(): True})
+
+            data = _issue_data(template, title, body, label, apply_label)
+            if not data:
+                return None
+
+            issue_url = await _post_issue_async(
+                client, repo_owner, repo_name, data, headers
+            )
+            if not issue_url and validated:
+                _forget_repo_validation(repo_owner, repo_name)
+            return issue_url
+    except httpx.HTTPError as ex:
+        log(f"Error creating issue on {repo_owner}/{repo_name}: {ex!r}")
         return None
+
+
+async def _already_validated() -> bool:
+    return True
+
+
+async def _post_issue_async(
+    client, repo_owner: str, repo_name: str, data: Dict[str, Any], headers: Dict
+) -> Optional[str]:
+    make_issue_url = f"{_api_url()}/repos/{repo_owner}/{repo_name}/issues"
+    response = await client.post(
+        make_issue_url, content=json.dumps(data), headers=headers
+    )
+    return _issue_url_from_response(data, response)
+
+
+async def make_github_issues_async(
+    issues: List[Dict[str, Any]],
+    label: Optional[str] = None,
+    max_concurrency: int = 4,
+) -> List[Optional[str]]:
+    """
+    Creates many GitHub issues at once, e.g. when triaging a backlog of feedback.
+
+    Issues are grouped by repository so that the repository and label are only
+    checked once per repository, and at most `max_concurrency` requests to GitHub
+    are in flight at a time.
+
+    Args:
+        issues: dicts with `repo_owner`, `repo_name`, and `title` and / or `body` keys
+        label: optional label to add to every issue *if* we can verify or create it
+        max_concurrency: the most requests to make to GitHub at the same time
+
+    Returns:
+        a list of issue URLs in the same order as `issues`, with None for
+        each issue that could not be created
+    """
+    urls: List[Optional[str]] = [None] * len(issues)
+    if not issues:
+        return urls
+    by_repo: Dict[Tuple[str, str], List[int]] = {}
+    for index, issue in enumerate(issues):
+        repo_key = (issue["repo_owner"], issue["repo_name"])
+        by_repo.setdefault(repo_key, []).append(index)
+
+    headers = _github_headers()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def limited(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    async def make_repo_issues(client, repo_owner: str, repo_name: str, indices):
+        if not _can_make_issue(repo_owner):
+            return
+        validated = _repo_was_validated(repo_owner, repo_name)
+        repo_ok, apply_label = await asyncio.gather(
+            (
+                limited(
+                    _repo_is_accessible_async(client, repo_owner, repo_name, headers)
+                )
+                if not validated
+                else _already_validated()
+            ),
+            limited(_ensure_label_async(client, repo_owner, repo_name, label, headers)),
+            return_exceptions=True,
+        )
+        if isinstance(apply_label, BaseException):
+            log(f"Unable to verify label '{label}': {apply_label!r}")
+            apply_label = False
+        if isinstance(repo_ok, BaseException):
+            log(f"Cannot access repo {repo_owner}/{repo_name}: {repo_ok!r}")
+            return
+        if not repo_ok:
+            return
+        if not validated:
+            _record_repo_validation({f"{repo_owner}/{repo_name}".lower(): True})
+
+        async def make_one(index: int):
+            data = _issue_data(
+                title=issues[index].get("title"),
+                body=issues[index].get("body"),
+                label=label,
+                apply_label=apply_label,
+            )
+            if data:
+                # One failed request leaves a None, instead of losing the whole batch
+                try:
+                    urls[index] = await limited(
+                        _post_issue_async(client, repo_owner, repo_name, data, headers)
+                    )
+                except httpx.HTTPError as ex:
+                    log(
+                        f'Could not create issue "{data["title"]}" on '
+                        f"{repo_owner}/{repo_name}: {ex!r}"
+                    )
+
+        await asyncio.gather(*[make_one(index) for index in indices])
+
+    async with _async_client() as client:
+        await asyncio.gather(
+            *[
+                make_repo_issues(client, repo_owner, repo_name, indices)
+                for (repo_owner, repo_name), indices in by_repo.items()
+            ]
+        )
+    return urls
+
+
+def make_github_issues(
+    issues: List[Dict[str, Any]],
+    label: Optional[str] = None,
+    max_concurrency: int = 4,
+) -> List[Optional[str]]:
+    """
+    Synchronous wrapper around `make_github_issues_async`, for use in interview code blocks.
+    """
+    return asyncio.run(
+        make_github_issues_async(issues, label=label, max_concurrency=max_concurrency)
+    )
@@ -0,0 +1,89 @@
+# pre-load
+
+import hashlib
+import hmac
+from datetime import datetime
+from typing import Optional
+
+from flask import jsonify, request
+from docassemble.base.util import get_config, log
+
+from docassemble.webapp.app_object import app, csrf
+
+from .feedback_on_server import update_issue_states
+from .github_issue import _start_route_validation
+
+__all__ = ["verify_signature"]
+
+# The issue actions that change whether an issue is open or closed
+_STATE_ACTIONS = {"opened", "closed", "reopened"}
+
+# docassemble loads this module once as each server process starts (it is pre-loaded),
+# unlike github_issue, which command line tools and workers import too
+_start_route_validation()
+
+
+def verify_signature(payload: bytes, signature: Optional[str], secret: str) -> bool:
+    """Checks the `X-Hub-Signature-256` header GitHub sends with each webhook delivery.
+
+    See https://docs.github.com/en/webhooks/using-webhooks/validating-webhook-deliveries
+    """
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), payload, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"sha256={expected}", signature)
+
+
+def _parse_github_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    # Saved like the other datetimes in the feedback table, which come from
+    # `datetime.now()`: in the server's local time, without a timezone
+    return (
+        datetime.fromisoformat(value.replace("Z", "+00:00"))
+        .astimezone()
+        .replace(tzinfo=None)
+    )
+
+
+@app.route("/githubfeedbackform/webhook", methods=["POST"])
+@csrf.exempt
+def github_feedback_webhook():
+    """Receives `issues` events from a GitHub webhook, so the admin dashboard can
+    show whether each feedback's issue is open or closed without asking GitHub.
+
+    Set `github issues: webhook secret` in the config to the secret used for the
+    webhook on GitHub. Deliveries without a valid signature are refused.
+    """
+    secret = (get_config("github issues") or {}).get("webhook secret")
+    if not secret:
+        log(
+            "github_feedback_webhook: no `webhook secret` in the `github issues` config"
+        )
+        return jsonify({"error": "webhook not configured"}), 403
+    if not verify_signature(
+        request.get_data(), request.headers.get("X-Hub-Signature-256"), secret
+    ):
+        return jsonify({"error": "invalid signature"}), 401
+
+    event = request.headers.get("X-GitHub-Event")
+    if event == "ping":
+        return jsonify({"ok": True})
+    if event != "issues":
+        return jsonify({"ok": True, "ignored": event})
+
+    payload = request.get_json(silent=True) or {}
+    issue = payload.get("issue") or {}
+    if payload.get("action") not in _STATE_ACTIONS or not issue.get("html_url"):
+        return jsonify({"ok": True, "ignored": payload.get("action")})
+
+    updated = update_issue_states(
+        [
+            {
+                "html_url": issue["html_url"],
+                "state": issue.get("state"),
+                "closed_at": _parse_github_datetime(issue.get("closed_at")),
+            }
+        ]
+    )
+    return jsonify({"ok": True, "updated": updated})
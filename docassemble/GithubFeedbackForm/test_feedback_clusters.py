@@ -0,0 +1,38 @@
+# do not pre-load
+
+from unittest import TestCase
+
+from .feedback_clusters import assign_themes, tokenize, vectorize
+
+
+class TestFeedbackClusters(TestCase):
+    def test_tokenize_drops_template_words(self):
+        self.assertEqual(
+            tokenize("Details | The upload button is BROKEN"),
+            ["upload", "button", "broken"],
+        )
+
+    def test_vectorize_is_normalized(self):
+        vectors = vectorize([["upload", "button"], []])
+        self.assertAlmostEqual(float((vectors[0] ** 2).sum()), 1.0, places=5)
+        self.assertEqual(float(abs(vectors[1]).sum()), 0.0)
+
+    def test_similar_feedback_shares_a_theme(self):
+        themes = []
+        assignments = assign_themes(
+            themes,
+            [
+                (1, "The upload button is broken"),
+                (2, "upload button broken on the last page"),
+                (3, "Please translate this form into Spanish"),
+            ],
+        )
+        self.assertEqual(len(assignments), 3)
+        self.assertIs(assignments[0][1], assignments[1][1])
+        self.assertIsNot(assignments[0][1], assignments[2][1])
+        self.assertEqual(len(themes), 2)
+
+        # New feedback joins the existing theme instead of starting another one
+        more = assign_themes(themes, [(4, "broken upload button")])
+        self.assertIs(more[0][1], assignments[0][1])
+        self.assertEqual(assignments[0][1].size, 3)
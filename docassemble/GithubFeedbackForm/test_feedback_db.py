@@ -1,10 +1,27 @@
 # do not pre-load
 
+import fakeredis
+import httpx
+import pickle
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
 from testcontainers.postgres import PostgresContainer
 from unittest import TestCase
 from unittest.mock import patch
 
 
+class FakeDARedis(fakeredis.FakeRedis):
+    """fakeredis with the get_data / set_data helpers of docassemble's DARedis"""
+
+    def get_data(self, key):
+        data = self.get(key)
+        return None if data is None else pickle.loads(data)
+
+    def set_data(self, key, data, expire=None):
+        self.set(key, pickle.dumps(data), ex=expire)
+
+
 class TestFeedbackOnServer(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -33,3 +50,384 @@ class TestFeedbackOnServer(TestCase):
         self.assertListEqual([r["interview"] for r in ratings], ["unittest"] * 2)
         self.assertEqual(ratings[0]["average"], 1)
         self.assertEqual(ratings[1]["average"], 0)
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_duplicate_reaction_is_dropped(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from . import feedback_on_server
+
+        redis = fakeredis.FakeRedis()
+        with patch.object(feedback_on_server, "DARedis", lambda: redis):
+            save_good_or_bad = feedback_on_server.save_good_or_bad
+            self.assertTrue(
+                save_good_or_bad(
+                    1, interview="unittest_dedup", version="1.0", session_id="abc"
+                )
+            )
+            self.assertFalse(
+                save_good_or_bad(
+                    -1, interview="unittest_dedup", version="1.0", session_id="abc"
+                )
+            )
+            # Another session, or another version, still counts
+            self.assertTrue(
+                save_good_or_bad(
+                    -1, interview="unittest_dedup", version="1.0", session_id="def"
+                )
+            )
+            self.assertTrue(
+                save_good_or_bad(
+                    1, interview="unittest_dedup", version="1.1", session_id="abc"
+                )
+            )
+            ttl = redis.ttl(
+                f"{feedback_on_server.redis_reaction_dedup_prefix}:unittest_dedup:1.0:abc"
+            )
+            self.assertTrue(
+                0 < ttl <= feedback_on_server.DEFAULT_REACTION_DEDUP_SECONDS
+            )
+
+        ratings = feedback_on_server.get_good_or_bad("unittest_dedup")
+        self.assertEqual([rating["count"] for rating in ratings], [1, 2])
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_dashboard_cache_is_invalidated_by_writes(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from . import feedback_on_server
+
+        redis = FakeDARedis()
+        with patch.object(feedback_on_server, "DARedis", lambda: redis):
+            feedback_on_server.save_good_or_bad(
+                1, interview="unittest_cache", version="1.0"
+            )
+            self.assertEqual(
+                feedback_on_server.get_dashboard_data(
+                    "good_or_bad", interview="unittest_cache"
+                )[0]["count"],
+                1,
+            )
+
+            # Writing around save_good_or_bad doesn't bump the version, so the
+            # cached result is still used
+            feedback_on_server._reaction_storage().save_good_or_bad(
+                -1, "unittest_cache", "1.0"
+            )
+            self.assertEqual(
+                feedback_on_server.get_dashboard_data(
+                    "good_or_bad", interview="unittest_cache"
+                )[0]["count"],
+                1,
+            )
+
+            feedback_on_server.save_good_or_bad(
+                1, interview="unittest_cache", version="1.0"
+            )
+            self.assertEqual(
+                feedback_on_server.get_dashboard_data(
+                    "good_or_bad", interview="unittest_cache"
+                )[0]["count"],
+                3,
+            )
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_good_or_bad_trend(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from .feedback_on_server import (
+            save_good_or_bad,
+            get_good_or_bad_trend,
+            compare_good_or_bad_versions,
+        )
+
+        save_good_or_bad(1, interview="unittest_trend", version="2.0.0")
+        save_good_or_bad(-1, interview="unittest_trend", version="2.0.0")
+        save_good_or_bad(1, interview="unittest_trend", version="2.0.0")
+
+        trend = get_good_or_bad_trend("unittest_trend", bucket="hour")
+        self.assertEqual(len(trend), 1)
+        self.assertEqual(trend[0]["count"], 3)
+        self.assertAlmostEqual(trend[0]["moving_average"], 1 / 3)
+        # Buckets are datetimes whichever database is used
+        self.assertIsInstance(trend[0]["bucket"], datetime)
+
+        comparison = compare_good_or_bad_versions("unittest_trend")
+        self.assertEqual(len(comparison), 1)
+        self.assertLess(comparison[0]["ci_low"], comparison[0]["average"])
+        self.assertGreater(comparison[0]["ci_high"], comparison[0]["average"])
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_cluster_feedback_marks_feedback_without_words(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from .feedback_on_server import (
+            NO_TEXT_CLUSTER_ID,
+            cluster_feedback,
+            get_all_feedback_info,
+            save_feedback_info,
+        )
+
+        worded_id = save_feedback_info(
+            "unittest_no_words", details="The address page will not save"
+        )
+        wordless_id = save_feedback_info("unittest_no_words", details="?!")
+
+        self.assertEqual(cluster_feedback("unittest_no_words"), 1)
+        rows = get_all_feedback_info("unittest_no_words")
+        self.assertEqual(rows[str(wordless_id)]["cluster_id"], NO_TEXT_CLUSTER_ID)
+        self.assertNotEqual(rows[str(worded_id)]["cluster_id"], NO_TEXT_CLUSTER_ID)
+        # Nothing is left to read on the next run
+        self.assertEqual(cluster_feedback("unittest_no_words"), 0)
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_feedback_hotspots(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from .feedback_on_server import save_feedback_info, get_feedback_hotspots
+
+        for question_id in ["intro", "intro", "address", None]:
+            save_feedback_info(
+                "unittest_hotspots",
+                body="Feedback",
+                question_id=question_id,
+                package_version="1.0.0",
+            )
+
+        hotspots = get_feedback_hotspots("unittest_hotspots")
+        self.assertListEqual(
+            [(h["question_id"], h["count"]) for h in hotspots],
+            [("intro", 2), ("address", 1)],
+        )
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_compact_feedback_body(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from .feedback_on_server import (
+            save_feedback_info,
+            get_all_feedback_info,
+            feedback_body,
+            feedback_text,
+        )
+
+        details = "The next button doesn't work. " * 50
+        feedback_id = save_feedback_info(
+            "unittest_compact",
+            details=details,
+            question_id="intro",
+            package_version="1.0.0",
+        )
+
+        row = get_all_feedback_info("unittest_compact")[str(feedback_id)]
+        self.assertIsNone(row["body"])
+        self.assertEqual(feedback_text(row), details)
+        self.assertIn("Question ID | `intro`", feedback_body(row))
+        self.assertIn(f"Details | {details}", feedback_body(row))
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_import_records(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from .feedback_import import import_records
+        from .feedback_on_server import get_all_feedback_info, feedback_text
+
+        records = [
+            {
+                "id": index,
+                "interview": "unittest_import",
+                "details": f"Imported feedback {index}",
+                "datetime": "2024-01-02T03:04:05",
+            }
+            for index in range(25)
+        ]
+        totals = import_records("feedback", records, batch_size=10)
+        self.assertEqual(totals.inserted, 25)
+
+        # Importing the same rows again doesn't duplicate them
+        totals = import_records("feedback", records, batch_size=10)
+        self.assertEqual(totals.inserted, 0)
+        self.assertEqual(totals.skipped, 25)
+
+        imported = get_all_feedback_info("unittest_import")
+        self.assertEqual(len(imported), 25)
+        self.assertIn(
+            "Imported feedback 0", [feedback_text(row) for row in imported.values()]
+        )
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_import_duplicate_reactions(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from .feedback_import import import_records
+        from .feedback_on_server import get_good_or_bad
+
+        # Thumbs up on the same day look the same, but are still separate reactions
+        reactions = [
+            {
+                "reaction": 1,
+                "interview": "unittest_import_reactions",
+                "version": "1",
+                "datetime": "2024-01-02",
+            }
+        ] * 5
+        totals = import_records("reactions", reactions, source="reactions.csv")
+        self.assertEqual(totals.inserted, 5)
+
+        # Importing the same file again still doesn't duplicate them
+        totals = import_records("reactions", reactions, source="reactions.csv")
+        self.assertEqual(totals.inserted, 0)
+        self.assertEqual(totals.skipped, 5)
+
+        ratings = get_good_or_bad("unittest_import_reactions")
+        self.assertEqual(ratings[0]["count"], 5)
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_create_github_issues_for_feedback(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from . import feedback_on_server, github_issue
+
+        repo_checks = Counter()
+
+        def github(request):
+            path = request.url.path
+            if request.method == "GET" and "/labels/" not in path:
+                repo_checks[path] += 1
+            if request.method == "POST" and path.endswith("/issues"):
+                if b"GitHub drops this one" in request.content:
+                    raise httpx.ConnectError("connection reset", request=request)
+                return httpx.Response(
+                    201, json={"html_url": f"https://github.com{path[6:]}/1"}
+                )
+            return httpx.Response(200, json={})
+
+        @asynccontextmanager
+        async def fake_client(client=None):
+            async with httpx.AsyncClient(
+                transport=httpx.MockTransport(github)
+            ) as client:
+                yield client
+
+        github_config = {
+            "token": "test-token",
+            "allowed repository owners": ["suffolklitlab"],
+        }
+        redis = fakeredis.FakeRedis()
+        with patch.object(
+            github_issue,
+            "get_config",
+            lambda key, default=None: (
+                github_config if key == "github issues" else default
+            ),
+        ), patch.object(github_issue, "DARedis", lambda: redis), patch.object(
+            github_issue, "_async_client", fake_client
+        ), patch.dict(
+            github_issue._routing_cache,
+            {"source": None, "table": None, "checked": 0.0},
+        ), patch.dict(
+            github_issue._validated_repos_cache,
+            {"loaded": 0.0, "repos": frozenset()},
+        ):
+            ids = [
+                feedback_on_server.save_feedback_info(
+                    "unittest_batch_issues",
+                    details=details,
+                    github_user="suffolklitlab",
+                    github_repo_name=repo,
+                )
+                for details, repo in [
+                    ("The first page is confusing", "repo-a"),
+                    ("GitHub drops this one", "repo-a"),
+                    ("The last page is confusing", "repo-b"),
+                ]
+            ]
+            results = feedback_on_server.create_github_issues_for_feedback(ids)
+
+        # Each repository is checked once, however many issues go to it
+        self.assertEqual(
+            dict(repo_checks),
+            {"/repos/suffolklitlab/repo-a": 1, "/repos/suffolklitlab/repo-b": 1},
+        )
+        self.assertEqual(
+            results,
+            {
+                str(ids[0]): "https://github.com/suffolklitlab/repo-a/issues/1",
+                str(ids[1]): None,
+                str(ids[2]): "https://github.com/suffolklitlab/repo-b/issues/1",
+            },
+        )
+        rows = feedback_on_server.get_all_feedback_info("unittest_batch_issues")
+        self.assertEqual(
+            [rows[str(feedback_id)]["html_url"] for feedback_id in ids],
+            [results[str(feedback_id)] for feedback_id in ids],
+        )
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_failed_issue_digest_is_throttled(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from . import feedback_on_server
+
+        redis = fakeredis.FakeRedis()
+        with patch.object(feedback_on_server, "DARedis", lambda: redis), patch.object(
+            feedback_on_server, "send_email", return_value=True
+        ) as send_email:
+            feedback_on_server.queue_failed_issue("suffolklitlab", "repo", body="one")
+            self.assertEqual(
+                feedback_on_server.send_failed_issue_digest("admin@example.com"), 1
+            )
+
+            # Failures within the interval wait for the next digest
+            feedback_on_server.queue_failed_issue("suffolklitlab", "repo", body="two")
+            self.assertEqual(
+                feedback_on_server.send_failed_issue_digest("admin@example.com"), 0
+            )
+            self.assertEqual(
+                feedback_on_server.send_failed_issue_digest(
+                    "admin@example.com", force=True
+                ),
+                1,
+            )
+            self.assertEqual(send_email.call_count, 2)
+            self.assertIn("two", send_email.call_args.kwargs["body"])
+
+            # Owners that aren't allowed are never queued
+            feedback_on_server.queue_failed_issue("someone-else", "repo", body="spam")
+            self.assertEqual(feedback_on_server.failed_issue_count(), 2)
+
+    @patch("docassemble.base.sql.alchemy_url")
+    def test_replay_failed_issues_requeues_failures(self, url1):
+        url1.return_value = self.__class__._psql_url
+        from . import feedback_on_server
+
+        redis = fakeredis.FakeRedis()
+        with patch.object(feedback_on_server, "DARedis", lambda: redis):
+            for title in ["works", "fails"]:
+                feedback_on_server.queue_failed_issue(
+                    "suffolklitlab", "repo", title=title, email_digest=False
+                )
+
+            def make_github_issues(issues, **kwargs):
+                return [
+                    (
+                        "https://github.com/suffolklitlab/repo/issues/1"
+                        if issue["title"] == "works"
+                        else None
+                    )
+                    for issue in issues
+                ]
+
+            with patch.object(
+                feedback_on_server, "make_github_issues", make_github_issues
+            ):
+                self.assertEqual(feedback_on_server.replay_failed_issues(), 1)
+                self.assertEqual(feedback_on_server.failed_issue_count(), 1)
+
+                # Issues that keep failing are eventually dropped
+                for _ in range(feedback_on_server.MAX_REPLAY_ATTEMPTS - 1):
+                    feedback_on_server.replay_failed_issues()
+                self.assertEqual(feedback_on_server.failed_issue_count(), 0)
+
+            # Nothing is lost when making the issues raises
+            feedback_on_server.queue_failed_issue(
+                "suffolklitlab", "repo", title="raises", email_digest=False
+            )
+            with patch.object(
+                feedback_on_server,
+                "make_github_issues",
+                side_effect=RuntimeError("GitHub is down"),
+            ):
+                with self.assertRaises(RuntimeError):
+                    feedback_on_server.replay_failed_issues()
+            self.assertEqual(feedback_on_server.failed_issue_count(), 1)
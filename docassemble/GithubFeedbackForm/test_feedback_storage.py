@@ -0,0 +1,180 @@
+# do not pre-load
+
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import fakeredis
+
+
+class TestJSONLFeedbackStorage(TestCase):
+    def setUp(self):
+        from .feedback_storage import JSONLFeedbackStorage
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.storage_class = JSONLFeedbackStorage
+        self.storage = JSONLFeedbackStorage(self.directory.name, compact_every=1000)
+
+    def test_updates_by_id_and_by_issue(self):
+        first = self.storage.save_feedback(
+            {"interview": "a.yml", "body": "first", "html_url": None}
+        )
+        second = self.storage.save_feedback(
+            {"interview": "a.yml", "body": "second", "html_url": None}
+        )
+        self.assertEqual(
+            self.storage.update_feedback(
+                {first: {"html_url": "https://github.com/o/r/issues/1"}, "nope": {}}
+            ),
+            1,
+        )
+        self.assertEqual(
+            self.storage.update_feedback_by_issue(
+                {"https://github.com/o/r/issues/1": {"archived": True}}
+            ),
+            1,
+        )
+        rows = self.storage.get_all_feedback_info(include_archived=True)
+        self.assertTrue(rows[first]["archived"])
+        self.assertFalse(rows[second].get("archived"))
+        self.assertEqual(list(self.storage.get_all_feedback_info()), [second])
+
+    def test_relinked_row_leaves_its_old_issue(self):
+        feedback_id = self.storage.save_feedback(
+            {"body": "moved", "html_url": "https://github.com/o/r/issues/1"}
+        )
+        self.storage.update_feedback(
+            {feedback_id: {"html_url": "https://github.com/o/r/issues/2"}}
+        )
+        self.assertEqual(
+            self.storage.update_feedback_by_issue(
+                {"https://github.com/o/r/issues/1": {"state": "closed"}}
+            ),
+            0,
+        )
+        self.assertEqual(
+            self.storage.update_feedback_by_issue(
+                {"https://github.com/o/r/issues/2": {"state": "closed"}}
+            ),
+            1,
+        )
+
+    def test_sees_rows_written_by_another_instance(self):
+        mine = self.storage.save_feedback({"body": "here"})
+        self.storage.update_feedback({mine: {"state": "open"}})
+        other = self.storage_class(self.directory.name)
+        feedback_id = other.save_feedback(
+            {"body": "elsewhere", "html_url": "https://github.com/o/r/issues/3"}
+        )
+        self.assertEqual(
+            self.storage.update_feedback_by_issue(
+                {"https://github.com/o/r/issues/3": {"state": "closed"}}
+            ),
+            1,
+        )
+        self.assertEqual(
+            self.storage.get_feedback([feedback_id])[feedback_id]["state"], "closed"
+        )
+
+    def test_compaction_keeps_rows_changes_and_reactions(self):
+        storage = self.storage_class(self.directory.name, compact_every=3)
+        feedback_id = storage.save_feedback(
+            {"body": "kept", "html_url": "https://github.com/o/r/issues/4"}
+        )
+        storage.update_feedback({feedback_id: {"state": "open"}})
+        # The third write compacts the file
+        storage.update_feedback({feedback_id: {"state": "closed"}})
+        with open(storage.feedback_path) as jsonl_file:
+            self.assertEqual(len(jsonl_file.readlines()), 1)
+        self.assertEqual(
+            storage.get_feedback([feedback_id])[feedback_id]["state"], "closed"
+        )
+        self.assertEqual(
+            storage.update_feedback_by_issue(
+                {"https://github.com/o/r/issues/4": {"archived": True}}
+            ),
+            1,
+        )
+
+        for reaction in [1, 1, -1, 1]:
+            storage.save_good_or_bad(reaction, "a.yml", "1.0")
+        storage.compact()
+        self.assertTrue(os.path.getsize(storage.reactions_path) > 0)
+        self.assertEqual(
+            storage.get_good_or_bad("a.yml"),
+            [{"interview": "a.yml", "version": "1.0", "count": 4, "average": 0.5}],
+        )
+
+
+class TestRedisStreamFeedbackStorage(TestCase):
+    def setUp(self):
+        from . import feedback_storage
+
+        server = fakeredis.FakeServer()
+        patcher = patch.object(
+            feedback_storage, "DARedis", lambda: fakeredis.FakeRedis(server=server)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.storage = feedback_storage.RedisStreamFeedbackStorage(prefix="test")
+
+    def test_updates_by_id_and_by_issue(self):
+        first = self.storage.save_feedback({"interview": "a.yml", "body": "first"})
+        second = self.storage.save_feedback({"interview": "a.yml", "body": "second"})
+        self.assertEqual(
+            self.storage.update_feedback(
+                {first: {"html_url": "https://github.com/o/r/issues/1"}}
+            ),
+            1,
+        )
+        self.assertEqual(
+            self.storage.update_feedback_by_issue(
+                {"https://github.com/o/r/issues/1": {"archived": True}}
+            ),
+            1,
+        )
+        self.assertEqual(list(self.storage.get_all_feedback_info()), [second])
+
+    def test_skips_ids_that_are_not_stream_ids(self):
+        feedback_id = self.storage.save_feedback({"body": "real"})
+        self.assertEqual(
+            self.storage.update_feedback(
+                {
+                    "3f2b9c1e": {"state": "closed"},
+                    "99999999999999-0": {"state": "closed"},
+                    feedback_id: {"state": "closed"},
+                }
+            ),
+            1,
+        )
+
+    def test_relinked_row_leaves_its_old_issue(self):
+        feedback_id = self.storage.save_feedback(
+            {"body": "moved", "html_url": "https://github.com/o/r/issues/1"}
+        )
+        self.storage.update_feedback(
+            {feedback_id: {"html_url": "https://github.com/o/r/issues/2"}}
+        )
+        self.assertEqual(
+            self.storage.update_feedback_by_issue(
+                {"https://github.com/o/r/issues/1": {"state": "closed"}}
+            ),
+            0,
+        )
+        self.assertEqual(
+            self.storage.update_feedback_by_issue(
+                {"https://github.com/o/r/issues/2": {"state": "closed"}}
+            ),
+            1,
+        )
+
+    def test_reaction_totals(self):
+        for reaction in [1, -1, 1, 1]:
+            self.storage.save_good_or_bad(reaction, "a.yml", "1.0")
+        self.storage.save_good_or_bad(1, "b.yml", None)
+        self.assertEqual(
+            self.storage.get_good_or_bad("a.yml"),
+            [{"interview": "a.yml", "version": "1.0", "count": 4, "average": 0.5}],
+        )
@@ -0,0 +1,215 @@
+# do not pre-load
+
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import Mock, patch
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import fakeredis
+
+
+class TestRepositoryRoutes(TestCase):
+    def setUp(self):
+        from . import github_issue
+
+        self.github_issue = github_issue
+        self.github_config = {
+            "token": "test-token",
+            "default repository owner": "suffolklitlab",
+            "allowed repository owners": ["suffolklitlab", "masslit"],
+            "repository routes": {
+                "docassemble.MassAccess": {"repository": "docassemble-MassAccess"},
+                "docassemble.MassAccess:housing_code.yml": {
+                    "owner": "masslit",
+                    "repository": "housing",
+                    "label": "housing feedback",
+                },
+                "docassemble.Spam": {"owner": "someone-else", "repository": "spam"},
+            },
+        }
+        for patcher in [
+            patch.object(self.github_issue, "get_config", self._get_config),
+            patch.dict(
+                self.github_issue._routing_cache,
+                {"source": None, "table": None, "checked": 0.0},
+            ),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get_config(self, key, default=None):
+        return self.github_config if key == "github issues" else default
+
+    def test_interview_route_wins_over_package_route(self):
+        route = self.github_issue.get_repository_route(
+            "docassemble.MassAccess:data/questions/housing_code.yml"
+        )
+        self.assertEqual(route, ("masslit", "housing", "housing feedback"))
+        route = self.github_issue.get_repository_route(
+            "docassemble.MassAccess:data/questions/other.yml"
+        )
+        self.assertEqual(route, ("suffolklitlab", "docassemble-MassAccess", None))
+
+    def test_routes_to_owners_that_are_not_allowed_are_ignored(self):
+        self.assertIsNone(
+            self.github_issue.get_repository_route(
+                "docassemble.Spam:data/questions/a.yml"
+            )
+        )
+        self.assertNotIn("someone-else", self.github_issue._get_allowed_repo_owners())
+
+    def test_feedback_repository_falls_back_to_the_package(self):
+        self.assertEqual(
+            self.github_issue.get_feedback_repository(
+                "docassemble.Unrouted:data/questions/a.yml"
+            ),
+            ("suffolklitlab", "docassemble-Unrouted", None),
+        )
+        self.assertEqual(
+            self.github_issue.get_feedback_repository(
+                "docassemble.MassAccess:data/questions/a.yml", "masslit", "saved"
+            ),
+            ("masslit", "saved", None),
+        )
+
+    def test_routes_file_is_reread_when_it_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            routes_path = os.path.join(directory, "routes.yml")
+            with open(routes_path, "w") as routes_file:
+                routes_file.write("docassemble.FromFile:\n  repository: first\n")
+            self.github_config["repository routes file"] = routes_path
+            self.assertEqual(
+                self.github_issue.get_repository_route(
+                    "docassemble.FromFile:a.yml"
+                ).repo,
+                "first",
+            )
+
+            with open(routes_path, "w") as routes_file:
+                routes_file.write("docassemble.FromFile:\n  repository: second\n")
+            stat = os.stat(routes_path)
+            os.utime(routes_path, (stat.st_atime, stat.st_mtime + 10))
+            # Not checked again until ROUTES_FILE_CHECK_SECONDS have passed
+            self.assertEqual(
+                self.github_issue.get_repository_route(
+                    "docassemble.FromFile:a.yml"
+                ).repo,
+                "first",
+            )
+            with patch.object(self.github_issue, "ROUTES_FILE_CHECK_SECONDS", 0):
+                self.assertEqual(
+                    self.github_issue.get_repository_route(
+                        "docassemble.FromFile:a.yml"
+                    ).repo,
+                    "second",
+                )
+
+
+class TestRepositoryValidation(TestCase):
+    def setUp(self):
+        from . import github_issue
+
+        self.github_issue = github_issue
+        self.redis = fakeredis.FakeRedis()
+        for patcher in [
+            patch.object(self.github_issue, "DARedis", lambda: self.redis),
+            patch.dict(
+                self.github_issue._validated_repos_cache,
+                {"loaded": 0.0, "repos": frozenset()},
+            ),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_each_repository_expires_on_its_own(self):
+        self.github_issue._record_repo_validation({"suffolklitlab/old": True})
+        a_day_later = time.time() + self.github_issue.REPO_VALIDATION_SECONDS + 1
+        with patch.object(self.github_issue.time, "time", lambda: a_day_later):
+            # Saving another repository doesn't keep the first one fresh
+            self.github_issue._record_repo_validation({"suffolklitlab/new": True})
+            self.assertEqual(
+                self.github_issue._validated_repositories(),
+                frozenset(["suffolklitlab/new"]),
+            )
+
+
+class TestFeedbackLink(TestCase):
+    def setUp(self):
+        from . import github_issue
+
+        self.github_issue = github_issue
+        self.thread = SimpleNamespace(current_info={"url_root": "https://example.com"})
+        self.interview_url = Mock(side_effect=self._interview_url)
+        for patcher in [
+            patch.object(self.github_issue, "interview_url", self.interview_url),
+            patch.object(
+                self.github_issue,
+                "get_config",
+                lambda key, default=None: (
+                    {"default repository owner": "suffolklitlab"}
+                    if key == "github issues"
+                    else default
+                ),
+            ),
+            patch.object(self.github_issue, "this_thread", self.thread),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.github_issue._feedback_link_base.cache_clear()
+        self.addCleanup(self.github_issue._feedback_link_base.cache_clear)
+
+    def _interview_url(self, **kwargs):
+        """Like docassemble's interview_url, for the parameters feedback_link uses"""
+        return f"{self.thread.current_info['url_root']}/interview?" + urlencode(
+            {key: value for key, value in kwargs.items() if value is not None}
+        )
+
+    def _context(self, question_id, variable):
+        return SimpleNamespace(
+            variable=variable,
+            question_id=question_id,
+            filename="docassemble.MassAccess:data/questions/housing.yml",
+            package="docassemble.MassAccess",
+            session="session-1",
+        )
+
+    def test_same_link_as_building_it_all_at_once(self):
+        for question_id, variable in [("intro", "users"), ("address", None)]:
+            link = self.github_issue.feedback_link(
+                self._context(question_id, variable),
+                i="docassemble.GithubFeedbackForm:feedback.yml",
+                github_repo="docassemble-MassAccess",
+                package_version="1.2.3",
+            )
+            expected = self._interview_url(
+                i="docassemble.GithubFeedbackForm:feedback.yml",
+                github_repo="docassemble-MassAccess",
+                github_user="suffolklitlab",
+                variable=variable,
+                question_id=question_id,
+                package_version="1.2.3",
+                filename="docassemble.MassAccess:data/questions/housing.yml",
+                session_id="session-1",
+                local=False,
+                reset=1,
+            )
+            self.assertEqual(urlsplit(link).path, urlsplit(expected).path)
+            self.assertEqual(
+                parse_qs(urlsplit(link).query), parse_qs(urlsplit(expected).query)
+            )
+        # The part that doesn't change between screens was only built once
+        self.assertEqual(self.interview_url.call_count, 1)
+
+    def test_links_for_another_host_are_not_reused(self):
+        for url_root in ["https://one.example.com", "https://two.example.com"]:
+            self.thread.current_info = {"url_root": url_root}
+            link = self.github_issue.feedback_link(
+                self._context("intro", None),
+                i="docassemble.GithubFeedbackForm:feedback.yml",
+                github_repo="docassemble-MassAccess",
+            )
+            self.assertTrue(link.startswith(url_root + "/interview?"))
+        self.assertEqual(self.interview_url.call_count, 2)
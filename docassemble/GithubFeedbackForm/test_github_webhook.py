@@ -0,0 +1,28 @@
+# do not pre-load
+
+from unittest import TestCase
+
+# The example from https://docs.github.com/en/webhooks/using-webhooks/validating-webhook-deliveries
+SECRET = "It's a Secret to Everybody"
+PAYLOAD = b"Hello, World!"
+SIGNATURE = "sha256=757107ea0eb2509fc211221cce984b8a37570b6d7586c22c46f4379c8b043e17"
+
+
+class TestVerifySignature(TestCase):
+    def setUp(self):
+        from .github_webhook import verify_signature
+
+        self.verify_signature = verify_signature
+
+    def test_accepts_githubs_signature(self):
+        self.assertTrue(self.verify_signature(PAYLOAD, SIGNATURE, SECRET))
+
+    def test_rejects_bad_signatures(self):
+        self.assertFalse(self.verify_signature(PAYLOAD, SIGNATURE, "another secret"))
+        self.assertFalse(self.verify_signature(b"Hello, World?", SIGNATURE, SECRET))
+        self.assertFalse(
+            self.verify_signature(
+                PAYLOAD, SIGNATURE.replace("sha256=", "sha1="), SECRET
+            )
+        )
+        self.assertFalse(self.verify_signature(PAYLOAD, None, SECRET))